@@ -0,0 +1,193 @@
+"""Client benchmarks for cf_tsm against the in-process stand-in API.
+
+Reports p50/p95/p99 latency and throughput for lock contention, state get
+and set across payload sizes, paginated listing and bulk download, plus the
+wall time of starting ``tsm-admin`` in a fresh interpreter. With
+``--baseline`` the run fails when a scenario's p95 regresses by more than
+``--max-regression`` compared to an earlier ``--json`` result.
+
+    python -m benchmarks.run_benchmarks --latency 0.02 --json results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from cf_tsm.http_client import configure_client, get_client
+from cf_tsm.state_management import StateManager
+from benchmarks.stand_in_api import StandInServer
+
+DEFAULT_SIZES = [1024, 64 * 1024, 1024 * 1024]
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+def summarize(scenario, samples, elapsed, payload_bytes=0):
+    result = {
+        "scenario": scenario,
+        "count": len(samples),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "ops_per_s": len(samples) / elapsed if elapsed else 0.0,
+    }
+    if payload_bytes:
+        result["mib_per_s"] = payload_bytes * len(samples) / (1024 * 1024) / elapsed if elapsed else 0.0
+    return result
+
+def timed(func, iterations):
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - call_started)
+    return samples, time.perf_counter() - started
+
+def seed_states(count, size, project="bench-list"):
+    body = b"x" * size
+    for i in range(count):
+        get_client().post(f"/api/v1/states/{project}/state-{i:05d}.tfstate", data=body).raise_for_status()
+
+def bench_state_io(sizes, iterations, work_dir):
+    results = []
+    for size in sizes:
+        source = os.path.join(work_dir, f"state-{size}.json")
+        with open(source, "wb") as f:
+            f.write(os.urandom(size))
+        path = f"/api/v1/states/bench-io/state-{size}.tfstate"
+
+        def upload():
+            with open(source, "rb") as f:
+                StateManager.upload_state(f"bench-io/state-{size}.tfstate", f)
+
+        samples, elapsed = timed(upload, iterations)
+        results.append(summarize(f"state_set[{size}B]", samples, elapsed, size))
+
+        output = os.path.join(work_dir, f"download-{size}.json")
+        samples, elapsed = timed(lambda: StateManager.download_to_file(path, output), iterations)
+        results.append(summarize(f"state_get[{size}B]", samples, elapsed, size))
+    return results
+
+def bench_listing(state_count, iterations):
+    seed_states(state_count, 16)
+    samples, elapsed = timed(lambda: StateManager.fetch_state_keys("bench-list"), iterations)
+    return [summarize(f"state_list[{state_count} keys]", samples, elapsed)]
+
+def bench_lock_contention(threads, attempts):
+    samples = []
+    samples_lock = threading.Lock()
+    acquired = []
+
+    def contend(worker):
+        client = get_client()
+        for attempt in range(attempts):
+            started = time.perf_counter()
+            response = client.post("/api/v1/lock/bench-lock/contended.tfstate", json={"ID": f"{worker}-{attempt}"})
+            elapsed = time.perf_counter() - started
+            with samples_lock:
+                samples.append(elapsed)
+            if response.status_code == 200:
+                acquired.append(worker)
+                client.delete("/api/v1/lock/bench-lock/contended.tfstate", json={"ID": f"{worker}-{attempt}"})
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=contend, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    result = summarize(f"lock_contention[{threads} threads]", samples, time.perf_counter() - started)
+    result["acquired"] = len(acquired)
+    return [result]
+
+def bench_bulk_download(state_count, size, iterations, workers, work_dir):
+    seed_states(state_count, size, project="bench-bulk")
+    output = os.path.join(work_dir, "bulk.zip")
+
+    def pull():
+        with contextlib.redirect_stdout(io.StringIO()):
+            StateManager.pull_all("bench-bulk", output, workers=workers)
+
+    samples, elapsed = timed(pull, iterations)
+    return [summarize(f"bulk_download[{state_count}x{size}B]", samples, elapsed, state_count * size)]
+
+def bench_startup(iterations):
+    """Time fresh ``tsm-admin`` processes that exit before any HTTP call is made."""
+    results = []
+    for argv in (["--help"], ["state", "--help"], ["state", "get"]):
+        command = [sys.executable, "-m", "cf_tsm.cli"] + argv
+
+        def start():
+            subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        samples, elapsed = timed(start, iterations)
+        results.append(summarize(f"cli_startup[{' '.join(argv)}]", samples, elapsed))
+    return results
+
+def print_results(results):
+    print(f"{'SCENARIO':<36} {'COUNT':>6} {'P50 ms':>9} {'P95 ms':>9} {'P99 ms':>9} {'OPS/S':>9} {'MIB/S':>9}")
+    for result in results:
+        mib = f"{result['mib_per_s']:.2f}" if "mib_per_s" in result else ""
+        print(f"{result['scenario']:<36} {result['count']:>6} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+              f"{result['p99_ms']:>9.2f} {result['ops_per_s']:>9.1f} {mib:>9}")
+
+def find_regressions(results, baseline, max_regression):
+    previous = {result["scenario"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(result["scenario"])
+        if before and result["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{result['scenario']}: p95 {before['p95_ms']:.2f} ms -> {result['p95_ms']:.2f} ms")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark cf_tsm against the stand-in API")
+    parser.add_argument("--latency", type=float, default=0.0, help="Added server latency per request in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra server latency per request in seconds")
+    parser.add_argument("--db", default=":memory:", help="SQLite file backing the stand-in API")
+    parser.add_argument("--iterations", type=int, default=20, help="Iterations per scenario")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="State payload sizes in bytes")
+    parser.add_argument("--list-states", type=int, default=2500, help="Number of states to list")
+    parser.add_argument("--lock-threads", type=int, default=8, help="Threads contending for one lock")
+    parser.add_argument("--bulk-states", type=int, default=100, help="Number of states in the bulk download")
+    parser.add_argument("--bulk-size", type=int, default=16 * 1024, help="Size of each state in the bulk download")
+    parser.add_argument("--workers", type=int, default=8, help="Client workers for bulk operations")
+    parser.add_argument("--startup-iterations", type=int, default=10, help="Fresh processes started per CLI startup scenario")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against results from an earlier --json run")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed relative p95 increase over the baseline")
+    args = parser.parse_args(argv)
+
+    with StandInServer(args.latency, args.jitter, args.db) as server, tempfile.TemporaryDirectory() as work_dir:
+        configure_client(base_url=server.url, pool_size=max(args.workers, args.lock_threads), auth_header="Bearer benchmark")
+        results = []
+        results += bench_lock_contention(args.lock_threads, args.iterations)
+        results += bench_state_io(args.sizes, args.iterations, work_dir)
+        results += bench_listing(args.list_states, args.iterations)
+        results += bench_bulk_download(args.bulk_states, args.bulk_size, max(1, args.iterations // 4), args.workers, work_dir)
+    results += bench_startup(args.startup_iterations)
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
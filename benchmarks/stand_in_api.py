@@ -0,0 +1,358 @@
+"""In-process stand-in for the Terraform State Manager Worker API.
+
+Serves the same routes as ``src/index.ts`` from a SQLite database, with the
+D1 tables created from ``migrations/*.sql`` and R2 emulated by an ``objects``
+table, so ``cf_tsm`` can be exercised and benchmarked without a Cloudflare
+account. An optional per-request latency simulates the network round trip.
+"""
+import glob
+import gzip
+import hashlib
+import io
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import urllib.parse
+import zipfile
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+LIST_PAGE_SIZE = 1000
+
+class StandInStore:
+    """SQLite-backed equivalent of the Worker's D1 database and R2 bucket."""
+
+    def __init__(self, db_path=":memory:"):
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            exists = self.db.execute("SELECT name FROM sqlite_master WHERE name = 'objects'").fetchone()
+            if not exists:
+                for migration in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, "*.sql"))):
+                    with open(migration) as f:
+                        self.db.executescript(f.read())
+                self.db.execute("CREATE TABLE objects (key TEXT PRIMARY KEY, body BLOB NOT NULL, etag TEXT NOT NULL, uploaded TEXT NOT NULL)")
+                self.db.commit()
+
+    def execute(self, sql, params=()):
+        with self.lock:
+            rows = self.db.execute(sql, params).fetchall()
+            self.db.commit()
+            return rows
+
+    def put_object(self, key, body):
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        uploaded = datetime.now(timezone.utc).isoformat()
+        self.execute("INSERT OR REPLACE INTO objects (key, body, etag, uploaded) VALUES (?, ?, ?, ?)", (key, body, etag, uploaded))
+
+    def get_object(self, key):
+        rows = self.execute("SELECT body, etag, uploaded FROM objects WHERE key = ?", (key,))
+        return rows[0] if rows else None
+
+    def delete_object(self, key):
+        self.execute("DELETE FROM objects WHERE key = ?", (key,))
+
+    def max_backups(self):
+        rows = self.execute("SELECT value FROM config WHERE key = 'maxBackups'")
+        return int(rows[0][0]) if rows else 3
+
+    def set_state(self, key, body):
+        # Same rotation as rotateBackups in src/stateManager.ts
+        max_backups = self.max_backups()
+        with self.lock:
+            self.db.execute("DELETE FROM objects WHERE key = ?", (f"{key}.{max_backups}",))
+            for i in range(max_backups - 1, 0, -1):
+                self.db.execute("UPDATE objects SET key = ? WHERE key = ?", (f"{key}.{i + 1}", f"{key}.{i}"))
+            self.db.execute("INSERT OR REPLACE INTO objects (key, body, etag, uploaded) "
+                            "SELECT ?, body, etag, uploaded FROM objects WHERE key = ?", (f"{key}.1", key))
+            self.db.commit()
+        self.put_object(key, body)
+
+    def delete_state(self, key):
+        self.delete_object(key)
+        for i in range(1, self.max_backups() + 1):
+            self.delete_object(f"{key}.{i}")
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without TCP_NODELAY the body
+    # waits on the client's delayed ACK and every response gains ~40 ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def store(self):
+        return self.server.store
+
+    def _read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            body = io.BytesIO()
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                body.write(self.rfile.read(size))
+                self.rfile.readline()
+            body = body.getvalue()
+        else:
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return body
+
+    def _send(self, status, body=b"", content_type="text/plain", headers=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_json(self, status, data, headers=None):
+        self._send(status, json.dumps(data), "application/json", headers)
+
+    def _dispatch(self):
+        self.server.simulate_latency()
+        parsed = urllib.parse.urlsplit(self.path)
+        path = urllib.parse.unquote(parsed.path)
+        query = dict(urllib.parse.parse_qsl(parsed.query))
+        body = self._read_body() if self.command in ("POST", "PUT", "DELETE", "LOCK", "UNLOCK") else b""
+
+        if self.server.auth_token and self.headers.get("Authorization") != f"Bearer {self.server.auth_token}":
+            return self._send(401, "Unauthorized")
+
+        prefix = "/api/v1/"
+        if not path.startswith(prefix):
+            return self._send(404, "Not Found")
+        route = path[len(prefix):]
+
+        if route == "states" and self.command == "GET":
+            return self._list_states(query)
+        if route.startswith("states/") and route.count("/") >= 2:
+            key = route[len("states/"):]
+            if self.command == "GET":
+                return self._get_state(key)
+            if self.command == "POST":
+                self.store.set_state(key, body)
+                if self.server.take_write_failure():
+                    return self._send(500, "Error setting state")
+                return self._send(200, "State updated successfully")
+            if self.command == "DELETE":
+                self.store.delete_state(key)
+                return self._send(200, "State and all backups deleted successfully")
+        if route.startswith("lock/") and route.count("/") >= 2:
+            project, name = route[len("lock/"):].split("/", 1)
+            return self._lock(project, name, body)
+        if route == "users":
+            return self._users(body)
+        if route.startswith("users/"):
+            return self._user(route[len("users/"):], body)
+        if route == "config":
+            return self._config(body)
+        if route == "backup/states" and self.command == "GET":
+            return self._backup_states()
+        if route == "backup/users" and self.command == "GET":
+            return self._backup_users()
+        return self._send(404, "Not Found")
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = do_LOCK = do_UNLOCK = _dispatch
+
+    def _list_states(self, query):
+        prefix = query.get("prefix") or (f"{query['project']}/" if query.get("project") else "")
+        limit = min(max(int(query.get("limit") or LIST_PAGE_SIZE), 1), LIST_PAGE_SIZE)
+        cursor = query.get("cursor") or ""
+        rows = self.store.execute(
+            "SELECT key, length(body), etag, uploaded FROM objects WHERE substr(key, 1, ?) = ? AND key > ? ORDER BY key LIMIT ?",
+            (len(prefix), prefix, cursor, limit + 1))
+        headers = {}
+        if len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = rows[-1][0]
+        if query.get("details"):
+            fingerprint = "\n".join(sorted(f"{key}:{etag}" for key, _, etag, _ in rows))
+            if "X-Next-Cursor" in headers:
+                fingerprint += "\ntruncated"
+            headers["ETag"] = f'"{hashlib.sha256(fingerprint.encode()).hexdigest()}"'
+            if self.headers.get("If-None-Match") == headers["ETag"]:
+                return self._send(304, headers=headers)
+            states = [{"key": key, "size": size, "etag": etag, "uploaded": uploaded} for key, size, etag, uploaded in rows]
+        else:
+            states = [row[0] for row in rows]
+        self._send_json(200, states, headers)
+
+    def _get_state(self, key):
+        stored = self.store.get_object(key)
+        if not stored:
+            return self._send(404, "State not found")
+        body, etag, _ = stored
+        headers = {"ETag": etag, "Accept-Ranges": "bytes"}
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, headers=headers)
+        self._send_ranged(body, headers)
+
+    def _send_ranged(self, body, headers, content_type="application/json"):
+        range_header = self.headers.get("Range", "")
+        if_range = self.headers.get("If-Range")
+        if range_header.startswith("bytes=") and (not if_range or if_range == headers["ETag"]):
+            start_text, _, end_text = range_header[len("bytes="):].partition("-")
+            start = int(start_text or 0)
+            end = min(int(end_text), len(body) - 1) if end_text else len(body) - 1
+            if start >= len(body):
+                return self._send(416, headers={"Content-Range": f"bytes */{len(body)}"})
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(body)}"
+            return self._send(206, body[start:end + 1], content_type, headers)
+        self._send(200, body, content_type, headers)
+
+    def _lock(self, project, name, body):
+        rows = self.store.execute("SELECT lock_info FROM locks WHERE project = ? AND name = ?", (project, name))
+        existing = json.loads(rows[0][0]) if rows else None
+        if self.command == "GET":
+            return self._send_json(200, existing or {"locked": False})
+        lock_info = json.loads(body) if body else {}
+        if self.command in ("POST", "LOCK"):
+            if existing:
+                return self._send_json(423, existing)
+            lock_info["Path"] = f"{project}/{name}"
+            lock_info.setdefault("Created", datetime.now(timezone.utc).isoformat())
+            try:
+                self.store.execute("INSERT INTO locks (project, name, lock_info) VALUES (?, ?, ?)",
+                                   (project, name, json.dumps(lock_info)))
+            except sqlite3.IntegrityError:
+                return self._lock(project, name, b"")
+            return self._send_json(200, lock_info)
+        if not existing:
+            return self._send_json(404, {"error": "Lock not found"})
+        if lock_info.get("ID") and lock_info["ID"] != existing.get("ID"):
+            return self._send_json(400, {"error": "Lock ID mismatch"})
+        self.store.execute("DELETE FROM locks WHERE project = ? AND name = ?", (project, name))
+        self._send_json(200, {"message": "Lock released successfully"})
+
+    def _fetch_users(self):
+        rows = self.store.execute("SELECT username, project, role, last_login, created_at, updated_at FROM auth")
+        fields = ["username", "project", "role", "last_login", "created_at", "updated_at"]
+        return [dict(zip(fields, row)) for row in rows]
+
+    def _users(self, body):
+        if self.command == "GET":
+            return self._send_json(200, self._fetch_users())
+        data = json.loads(body or b"{}")
+        if not all(data.get(field) for field in ("username", "password", "project", "role")):
+            return self._send(400, "Missing required fields")
+        try:
+            self.store.execute("INSERT INTO auth (username, password, project, role) VALUES (?, ?, ?, ?)",
+                               (data["username"], hashlib.sha256(data["password"].encode()).hexdigest(), data["project"], data["role"]))
+        except sqlite3.IntegrityError:
+            return self._send(409, "User already exists")
+        self._send(201, "User added successfully")
+
+    def _user(self, username, body):
+        if self.command == "DELETE":
+            self.store.execute("DELETE FROM auth WHERE username = ?", (username,))
+            return self._send(200, "User deleted successfully")
+        data = json.loads(body or b"{}")
+        updates = {field: data[field] for field in ("password", "project", "role") if data.get(field)}
+        if not updates:
+            return self._send(400, "No updates provided")
+        assignments = ", ".join(f"{field} = ?" for field in updates)
+        self.store.execute(f"UPDATE auth SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE username = ?",
+                           (*updates.values(), username))
+        self._send(200, "User updated successfully")
+
+    def _config(self, body):
+        if self.command == "GET":
+            return self._send_json(200, {"maxBackups": self.store.max_backups()})
+        data = json.loads(body or b"{}")
+        if not isinstance(data.get("maxBackups"), int) or data["maxBackups"] <= 0:
+            return self._send(400, "Invalid configuration")
+        self.store.execute("INSERT OR REPLACE INTO config (key, value) VALUES ('maxBackups', ?)", (str(data["maxBackups"]),))
+        self._send(200, "Configuration updated successfully")
+
+    def _backup_states(self):
+        rows = self.store.execute("SELECT key, body, etag FROM objects ORDER BY key")
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            for key, body, _ in rows:
+                archive.writestr(zipfile.ZipInfo(key, (1980, 1, 1, 0, 0, 0)), body)
+        fingerprint = "\n".join(f"{key}:{etag}" for key, _, etag in rows).encode()
+        headers = {"ETag": f'"{hashlib.sha256(fingerprint).hexdigest()}"', "Accept-Ranges": "bytes"}
+        self._send_ranged(buffer.getvalue(), headers, "application/zip")
+
+    def _backup_users(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr("users_backup.json", json.dumps(self._fetch_users()))
+        self._send(200, buffer.getvalue(), "application/zip")
+
+class StandInServer(ThreadingHTTPServer):
+    """Threaded HTTP server running the stand-in API on a background thread.
+
+    Use as a context manager; ``url`` is the base URL to point ``cf_tsm`` at.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, jitter=0.0, db_path=":memory:", auth_token=None, host="127.0.0.1", port=0):
+        super().__init__((host, port), StandInHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.auth_token = auth_token
+        self.store = StandInStore(db_path)
+        # State uploads to store but answer with 500, like a Worker that fails after writing
+        self.write_failures = 0
+        self._failures_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def simulate_latency(self):
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def take_write_failure(self):
+        with self._failures_lock:
+            if self.write_failures <= 0:
+                return False
+            self.write_failures -= 1
+            return True
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run the stand-in Terraform State Manager API")
+    parser.add_argument("--port", type=int, default=8787, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.0, help="Added latency per request in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency per request in seconds")
+    parser.add_argument("--db", default=":memory:", help="SQLite database file (default: in memory)")
+    args = parser.parse_args()
+    server = StandInServer(args.latency, args.jitter, args.db, port=args.port)
+    print(f"Stand-in API listening on {server.url}")
+    server.serve_forever()
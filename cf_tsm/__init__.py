@@ -1,4 +1,21 @@
-from .user_management import UserManager
-from .config_management import ConfigManager
-from .state_management import StateManager
-from .cli import main
+import importlib
+
+# Public names are resolved on first access so importing cf_tsm (which the
+# tsm-admin entry point always does) does not load every manager and requests.
+_LAZY_ATTRIBUTES = {
+    "UserManager": ".user_management",
+    "ConfigManager": ".config_management",
+    "StateManager": ".state_management",
+    "LockManager": ".lock_management",
+    "HttpClient": ".http_client",
+    "TsmClient": ".api",
+    "StateWatcher": ".state_watch",
+    "main": ".cli",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
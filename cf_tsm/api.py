@@ -0,0 +1,374 @@
+"""Library interface to the Terraform State Manager API.
+
+``TsmClient`` returns data and raises :mod:`cf_tsm.exceptions` errors instead
+of printing, so automation can call it in-process and reuse pooled
+connections rather than spawning ``tsm-admin`` and parsing its output::
+
+    from cf_tsm import TsmClient
+    from cf_tsm.exceptions import NotFoundError
+
+    tsm = TsmClient()
+    keys = [entry["key"] for entry in tsm.iter_states(project="infra", include_backups=False)]
+    states = tsm.get_states(keys)
+"""
+import contextlib
+import getpass
+import hashlib
+import io
+import random
+import re
+import socket
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+from .exceptions import BatchError, LockedError, LockTimeoutError, NotFoundError, TransportError, raise_for_status
+from .http_client import HttpClient, get_client, RETRY_STATUSES
+from .utils import CHUNK_SIZE, DEFAULT_LOCK_WAIT, DEFAULT_WORKERS, gzip_chunks, run_concurrently
+
+BACKUP_SUFFIX_RE = re.compile(r"\.(\d+)$")
+MAX_LOCK_POLL_INTERVAL = 15.0
+
+StateEntry = Dict[str, Any]
+
+def is_backup_key(key: str) -> bool:
+    """True for rotated backup copies (``<state>.N``)."""
+    return bool(BACKUP_SUFFIX_RE.search(key))
+
+def state_prefix(project: Optional[str] = None, prefix: Optional[str] = None) -> Optional[str]:
+    """Listing prefix for states of a project, with ``prefix`` relative to it."""
+    return f"{project}/{prefix or ''}" if project else prefix
+
+def filter_state_entries(entries: List[StateEntry], prefix: Optional[str] = None,
+                         include_backups: bool = True) -> List[StateEntry]:
+    if prefix:
+        entries = [entry for entry in entries if entry["key"].startswith(prefix)]
+    if not include_backups:
+        entries = [entry for entry in entries if not is_backup_key(entry["key"])]
+    return entries
+
+def state_upload_body(data: Union[bytes, BinaryIO], compress: bool = False) -> Tuple[Any, Dict[str, str]]:
+    """Return the request body and headers to upload bytes or a binary file object without buffering it."""
+    headers = {}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+        return gzip_chunks(io.BytesIO(data) if isinstance(data, bytes) else data), headers
+    if isinstance(data, (bytes, io.BufferedReader)):
+        # Real files let requests send a Content-Length
+        return data, headers
+    return iter(lambda: data.read(CHUNK_SIZE), b""), headers
+
+def replayable_body(data: Union[bytes, BinaryIO]) -> bool:
+    """True if an upload body can be sent again: bytes or a seekable file object."""
+    return isinstance(data, bytes) or (hasattr(data, "seekable") and data.seekable())
+
+def content_md5(data: Union[bytes, BinaryIO]) -> str:
+    """Hex MD5 of bytes, or of a seekable file object from its current position, which is restored afterwards."""
+    if isinstance(data, bytes):
+        return hashlib.md5(data).hexdigest()
+    start = data.tell()
+    digest = hashlib.md5()
+    for chunk in iter(lambda: data.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+    data.seek(start)
+    return digest.hexdigest()
+
+class TsmClient:
+    """Typed access to states, locks, users and configuration.
+
+    Without arguments the process-wide HTTP client is used, so the CLI and
+    library callers in one process share a connection pool. Passing
+    ``base_url``, ``auth_header`` or other ``HttpClient`` options creates a
+    dedicated client instead.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, auth_header: Optional[str] = None,
+                 http_client: Optional[HttpClient] = None, **options: Any):
+        # Only a client created here is closed on exit; shared and caller-supplied ones stay open
+        self._owns_http = http_client is None and bool(base_url or auth_header or options)
+        if self._owns_http:
+            if base_url:
+                options["base_url"] = base_url
+            http_client = HttpClient(auth_header=auth_header, **options)
+        self.http = http_client or get_client()
+
+    def close(self) -> None:
+        self.http.close()
+
+    def __enter__(self) -> "TsmClient":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self._owns_http:
+            self.close()
+
+    # States
+
+    def list_state_page(self, prefix: Optional[str] = None, cursor: Optional[str] = None, limit: int = 1000,
+                        etag: Optional[str] = None) -> Optional[Tuple[List[StateEntry], Optional[str], Optional[str]]]:
+        """Fetch one listing page with per-state metadata.
+
+        Returns ``(entries, next_cursor, page_etag)``, or None if ``etag`` is
+        given and the page is unchanged (the server answers 304 without a body).
+        """
+        params = {"details": "1", "limit": str(limit)}
+        if prefix:
+            params["prefix"] = prefix
+        if cursor:
+            params["cursor"] = cursor
+        response = self.http.get("/api/v1/states", params=params, headers={"If-None-Match": etag} if etag else None)
+        if response.status_code == 304:
+            return None
+        raise_for_status(response)
+        # Older Workers ignore "details" and return plain keys
+        page = [{"key": item, "etag": None} if isinstance(item, str) else item for item in response.json()]
+        return page, response.headers.get("X-Next-Cursor"), response.headers.get("ETag")
+
+    def iter_state_pages(self, project: Optional[str] = None, prefix: Optional[str] = None,
+                         include_backups: bool = True, limit: Optional[int] = None,
+                         page_size: int = 1000) -> Iterator[List[StateEntry]]:
+        """Yield stored states one listing page at a time, following the cursor.
+
+        Each entry is a dict with ``key`` and, if the server reports them,
+        ``size``, ``etag`` and ``uploaded``. ``prefix`` is relative to
+        ``project`` when both are given.
+        """
+        full_prefix = state_prefix(project, prefix)
+        cursor = None
+        remaining = limit
+        while remaining is None or remaining > 0:
+            page, cursor, _ = self.list_state_page(full_prefix, cursor, min(page_size, remaining or page_size))
+            page = filter_state_entries(page, full_prefix, include_backups)
+            if remaining is not None:
+                page = page[:remaining]
+                remaining -= len(page)
+            yield page
+            if not cursor:
+                return
+
+    def iter_states(self, project: Optional[str] = None, prefix: Optional[str] = None,
+                    include_backups: bool = True, limit: Optional[int] = None) -> Iterator[StateEntry]:
+        for page in self.iter_state_pages(project, prefix, include_backups, limit):
+            yield from page
+
+    def list_states(self, project: Optional[str] = None, prefix: Optional[str] = None,
+                    include_backups: bool = True, limit: Optional[int] = None) -> List[StateEntry]:
+        return list(self.iter_states(project, prefix, include_backups, limit))
+
+    def get_state(self, project: str, state_path: str) -> bytes:
+        """Return the raw body of a state."""
+        return self.get_state_by_key(f"{project}/{state_path}")
+
+    def get_state_by_key(self, key: str) -> bytes:
+        response = self.http.get(f"/api/v1/states/{key}")
+        raise_for_status(response)
+        return response.content
+
+    def stream_state(self, project: str, state_path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Yield the body of a state in chunks without holding it in memory.
+
+        The underlying response is released when the iterator is exhausted or closed.
+        """
+        path = f"/api/v1/states/{project}/{state_path}"
+        with self.http.get(path, stream=True) as response:
+            raise_for_status(response)
+            try:
+                yield from response.iter_content(chunk_size)
+            except self.http.transport_errors as error:
+                raise TransportError(f"GET {path} failed: {error}") from error
+
+    def get_states(self, keys: List[str], workers: int = DEFAULT_WORKERS) -> Dict[str, bytes]:
+        """Fetch many states (by ``project/state_path`` key) concurrently.
+
+        Raises BatchError carrying the successful results if any fetch failed.
+        """
+        results, errors = {}, {}
+        for key, body, error in run_concurrently(self.get_state_by_key, keys, workers):
+            if error:
+                errors[key] = error
+            else:
+                results[key] = body
+        if errors:
+            raise BatchError(errors, results)
+        return results
+
+    def state_etag_matches(self, project: str, state_path: str, etag: str) -> bool:
+        """Check with a conditional one-byte GET whether a state currently has this ETag.
+
+        The Worker answers 304 without a body when If-None-Match matches, so
+        the check costs a single tiny round trip. R2 ETags are the quoted MD5
+        of the body for single-part uploads.
+        """
+        headers = {"If-None-Match": etag, "Range": "bytes=0-0"}
+        with self.http.get(f"/api/v1/states/{project}/{state_path}", headers=headers, stream=True) as response:
+            return response.status_code == 304
+
+    def put_state(self, project: str, state_path: str, data: Union[bytes, BinaryIO], compress: bool = False,
+                  skip_unchanged: bool = False, wait_lock: Optional[float] = None,
+                  operation: str = "cf_tsm put_state") -> Optional[str]:
+        """Upload a state from bytes or a binary file object; returns the server's message.
+
+        With ``skip_unchanged`` nothing is sent, and None is returned, when the
+        state already holds this content; ``data`` must then be bytes or a
+        seekable file. With ``wait_lock`` the state lock is taken first,
+        waiting up to that many seconds, and released after the upload.
+        """
+        if skip_unchanged and not replayable_body(data):
+            raise ValueError("skip_unchanged needs bytes or a seekable file to hash")
+        with self.locked(project, state_path, wait_lock, operation) if wait_lock is not None else contextlib.nullcontext():
+            if skip_unchanged and self.state_etag_matches(project, state_path, f'"{content_md5(data)}"'):
+                return None
+            return self._upload_state(project, state_path, data, compress)
+
+    def _upload_state(self, project: str, state_path: str, data: Union[bytes, BinaryIO], compress: bool) -> str:
+        """POST a state body, retrying transient failures only if the upload did not land.
+
+        The Worker rotates the backups before it writes the new state, so an
+        upload that timed out or failed with a server error may still have
+        landed, and sending it again would rotate once more and drop the
+        oldest backup. Such uploads are only retried after a conditional GET
+        shows the state does not hold the new content yet.
+        """
+        path = f"/api/v1/states/{project}/{state_path}"
+        replayable = replayable_body(data)
+        start = None if isinstance(data, bytes) or not replayable else data.tell()
+        etag = None
+        attempt = 0
+        while True:
+            # Built per attempt, gzip streams cannot be rewound
+            body, headers = state_upload_body(data, compress)
+            response = error = None
+            try:
+                response = self.http.post(path, data=body, headers=headers, retry=False)
+            except TransportError as transport_error:
+                error = transport_error
+            if (response is not None and response.status_code not in RETRY_STATUSES) or not replayable \
+                    or attempt >= self.http.retry_policy.retries:
+                if error:
+                    raise error
+                raise_for_status(response)
+                return response.text
+            if start is not None:
+                data.seek(start)
+            # A 429 is refused before the Worker touches the bucket
+            if response is None or response.status_code != 429:
+                etag = etag or f'"{content_md5(data)}"'
+                if self.state_etag_matches(project, state_path, etag):
+                    if response is not None:
+                        response.close()
+                    return "State updated successfully"
+            delay = self.http.retry_policy.delay(attempt, response)
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def delete_state(self, project: str, state_path: str, wait_lock: Optional[float] = None,
+                     operation: str = "cf_tsm delete_state") -> str:
+        """Delete a state and all of its rotated backups, holding the state lock first if wait_lock is given."""
+        with self.locked(project, state_path, wait_lock, operation) if wait_lock is not None else contextlib.nullcontext():
+            response = self.http.delete(f"/api/v1/states/{project}/{state_path}")
+            raise_for_status(response)
+            return response.text
+
+    # Locks
+
+    def get_lock(self, project: str, state_path: str) -> Optional[Dict[str, Any]]:
+        """Return the lock info of a state, or None if it is not locked."""
+        response = self.http.get(f"/api/v1/lock/{project}/{state_path}")
+        raise_for_status(response)
+        lock_info = response.json()
+        return None if lock_info.get("locked") is False else lock_info
+
+    def acquire_lock(self, project: str, state_path: str, lock_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Take the lock of a state; raises LockedError describing the holder if it is taken."""
+        response = self.http.post(f"/api/v1/lock/{project}/{state_path}", json=lock_info)
+        raise_for_status(response)
+        return response.json()
+
+    def release_lock(self, project: str, state_path: str, lock_id: Optional[str] = None) -> None:
+        """Release a lock; with lock_id only if it is still the lock with that ID."""
+        response = self.http.delete(f"/api/v1/lock/{project}/{state_path}", json={"ID": lock_id} if lock_id else {})
+        raise_for_status(response)
+
+    def wait_for_lock(self, project: str, state_path: str, timeout: float = DEFAULT_LOCK_WAIT,
+                      operation: str = "cf_tsm") -> str:
+        """Take the lock of a state, polling with jittered exponential backoff while someone else holds it.
+
+        Returns the lock ID to pass to release_lock; raises LockTimeoutError
+        when the lock is still held after timeout seconds.
+        """
+        lock_info = {
+            "ID": str(uuid.uuid4()),
+            "Operation": operation,
+            "Info": "",
+            "Who": f"{getpass.getuser()}@{socket.gethostname()}",
+            "Version": "",
+            "Created": datetime.now(timezone.utc).isoformat(),
+        }
+        deadline = time.monotonic() + timeout
+        interval = 0.5
+        while True:
+            try:
+                self.acquire_lock(project, state_path, lock_info)
+                return lock_info["ID"]
+            except LockedError as error:
+                holder = error.lock_info
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LockTimeoutError(f"Timed out after {timeout:.0f}s waiting for the lock on {project}/{state_path}, "
+                                       f"held by {holder.get('Who')} (ID {holder.get('ID')})", holder)
+            time.sleep(min(remaining, random.uniform(interval / 2, interval)))
+            interval = min(interval * 2, MAX_LOCK_POLL_INTERVAL)
+
+    @contextlib.contextmanager
+    def locked(self, project: str, state_path: str, timeout: float = DEFAULT_LOCK_WAIT,
+               operation: str = "cf_tsm") -> Iterator[str]:
+        """Hold the lock of a state for a with block, see wait_for_lock; yields the lock ID."""
+        lock_id = self.wait_for_lock(project, state_path, timeout, operation)
+        try:
+            yield lock_id
+        finally:
+            try:
+                self.release_lock(project, state_path, lock_id)
+            except NotFoundError:
+                # A retried DELETE finds the lock already released by the first attempt
+                pass
+
+    # Users
+
+    def list_users(self) -> List[Dict[str, Any]]:
+        response = self.http.get("/api/v1/users")
+        raise_for_status(response)
+        return response.json()
+
+    def create_user(self, username: str, password: str, project: str, role: str) -> str:
+        response = self.http.post("/api/v1/users", json={"username": username, "password": password,
+                                                          "project": project, "role": role})
+        raise_for_status(response)
+        return response.text
+
+    def update_user(self, username: str, password: Optional[str] = None, project: Optional[str] = None,
+                    role: Optional[str] = None) -> str:
+        """Change the given fields of a user; fields left as None keep their value."""
+        data = {field: value for field, value in (("password", password), ("project", project), ("role", role)) if value}
+        response = self.http.put(f"/api/v1/users/{username}", json=data)
+        raise_for_status(response)
+        return response.text
+
+    def delete_user(self, username: str) -> str:
+        response = self.http.delete(f"/api/v1/users/{username}")
+        raise_for_status(response)
+        return response.text
+
+    # Configuration
+
+    def get_config(self) -> Dict[str, Any]:
+        response = self.http.get("/api/v1/config")
+        raise_for_status(response)
+        return response.json()
+
+    def set_config(self, max_backups: int) -> str:
+        response = self.http.post("/api/v1/config", json={"maxBackups": max_backups})
+        raise_for_status(response)
+        return response.text
@@ -0,0 +1,195 @@
+"""Run many tsm-admin commands in one process over the shared HTTP session.
+
+Each line of the input is an ordinary command such as ``user add --username
+alice --project infra --role read``. Commands touching the same state, user
+or the configuration run one after another in input order; everything else
+runs concurrently. One JSON result per command is written to stdout as it
+finishes.
+"""
+import argparse
+import contextlib
+import io
+import json
+import re
+import secrets
+import shlex
+import sys
+import threading
+import time
+from .cli import load_manager
+from .http_client import get_client
+from .utils import run_concurrently, DEFAULT_WORKERS
+
+BATCH_ACTIONS = ["user", "config", "state", "lock"]
+
+PASSWORD_RE = re.compile(r"(--password[= ])(\"[^\"]*\"|'[^']*'|\S+)")
+
+class BatchCommandError(Exception):
+    """A batch line is not a valid command."""
+
+class CommandParser(argparse.ArgumentParser):
+    """ArgumentParser that raises BatchCommandError instead of exiting."""
+
+    def error(self, message):
+        raise BatchCommandError(message)
+
+class ThreadOutput:
+    """Replacement for sys.stdout that gives every running command its own buffer.
+
+    Output from threads that are not running a command goes to the fallback
+    stream, so it never mixes with the JSON results.
+    """
+
+    def __init__(self, fallback):
+        self._fallback = fallback
+        self._local = threading.local()
+
+    def __getattr__(self, name):
+        return getattr(getattr(self._local, "stream", None) or self._fallback, name)
+
+    def begin(self):
+        # A text wrapper over bytes also serves commands writing to sys.stdout.buffer
+        self._local.stream = io.TextIOWrapper(io.BytesIO(), encoding="utf-8", write_through=True)
+
+    def end(self):
+        stream, self._local.stream = self._local.stream, None
+        stream.flush()
+        return stream.buffer.getvalue().decode("utf-8", "replace")
+
+class BatchManager:
+    @staticmethod
+    def add_arguments(parser):
+        parser.add_argument("file", nargs="?", default="-", help="File with one command per line (default: stdin)")
+        parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of commands to run concurrently")
+
+    @staticmethod
+    def handle_action(args):
+        total, failed = BatchManager.run_batch(args.file, args.workers, args.debug)
+        print(f"Ran {total} commands, {failed} failed.", file=sys.stderr)
+        return not failed
+
+    @staticmethod
+    def build_parser(debug=False):
+        """Parser for batch lines: the user, config, state and lock commands without global options."""
+        parser = CommandParser(prog="tsm-admin")
+        parser.add_argument("--debug", action="store_true", default=debug, help="Enable debug output")
+        subparsers = parser.add_subparsers(dest="action", required=True)
+        action_subparsers = {}
+        for name in BATCH_ACTIONS:
+            action_subparsers[name] = subparsers.add_parser(name).add_subparsers(dest=f"{name}_action", required=True)
+            load_manager(name).add_parsers(action_subparsers[name])
+        # Batches cannot prompt; new users without a password get a generated one
+        action_subparsers["user"].choices["add"].add_argument("--password", help="Password (default: generated)")
+        action_subparsers["user"].choices["update"].add_argument("--password", default="", help="New password")
+        action_subparsers["config"].choices["init-admin"].add_argument("--password", help="Admin password (default: generated)")
+        return parser
+
+    @staticmethod
+    def parse_commands(lines, parser):
+        """Parse batch lines, skipping blanks and # comments; invalid lines carry an error instead of args."""
+        commands = []
+        for number, line in enumerate(lines, 1):
+            text = line.strip()
+            if not text or text.startswith("#"):
+                continue
+            command = {"line": number, "command": PASSWORD_RE.sub(r"\1***", text)}
+            try:
+                argv = shlex.split(text)
+                if argv and argv[0] == "tsm-admin":
+                    argv = argv[1:]
+                # --help prints usage and exits, keep that off the results stream
+                with contextlib.redirect_stdout(sys.stderr):
+                    command["args"] = parser.parse_args(argv)
+            except (BatchCommandError, ValueError) as error:
+                command["error"] = str(error)
+            except SystemExit:
+                command["error"] = "--help is not supported in batch mode"
+            commands.append(command)
+        return commands
+
+    @staticmethod
+    def command_key(args):
+        """Commands with the same key run in input order; None means no ordering constraint."""
+        if getattr(args, "project", None) and getattr(args, "state_path", None):
+            return f"state:{args.project}/{args.state_path}"
+        if getattr(args, "username", None):
+            return f"user:{args.username}"
+        if args.action == "config":
+            return "config"
+        return None
+
+    @staticmethod
+    def run_command(command, output):
+        result = {"line": command["line"], "command": command["command"]}
+        if "error" in command:
+            result.update(status="failed", error=command["error"])
+            return result
+        args = command["args"]
+        generated = None
+        if (args.action, getattr(args, f"{args.action}_action")) in (("user", "add"), ("config", "init-admin")) \
+                and args.password is None:
+            generated = args.password = secrets.token_urlsafe(16)
+
+        error = None
+        ok = False
+        start = time.perf_counter()
+        output.begin()
+        try:
+            # handle_action returns False when the command, or any item of a bulk command, failed
+            ok = load_manager(args.action).handle_action(args)
+        except SystemExit as exit_error:
+            error = f"exited with status {exit_error.code}"
+        except Exception as exception:
+            error = str(exception) or type(exception).__name__
+        finally:
+            text = output.end()
+        result.update(status="ok" if ok and not error else "failed",
+                      seconds=round(time.perf_counter() - start, 3), output=text)
+        if error:
+            result["error"] = error
+        if generated and result["status"] == "ok":
+            result["password"] = generated
+        return result
+
+    @staticmethod
+    def run_batch(source="-", workers=DEFAULT_WORKERS, debug=False, out=None):
+        """Run the commands in a file (or stdin for '-') and write one JSON result line per command to out.
+
+        Returns (number of commands, number failed).
+        """
+        out = out or sys.stdout
+        if source == "-":
+            lines = sys.stdin.readlines()
+        else:
+            with open(source) as f:
+                lines = f.readlines()
+        commands = BatchManager.parse_commands(lines, BatchManager.build_parser(debug))
+
+        chains = {}
+        for command in commands:
+            key = BatchManager.command_key(command["args"]) if "args" in command else None
+            chains.setdefault(key or ("line", command["line"]), []).append(command)
+
+        output = ThreadOutput(sys.stderr)
+        output_lock = threading.Lock()
+        failed = []
+
+        def run_chain(chain):
+            for command in chain:
+                result = BatchManager.run_command(command, output)
+                with output_lock:
+                    out.write(json.dumps(result) + "\n")
+                    out.flush()
+                    if result["status"] != "ok":
+                        failed.append(result["line"])
+
+        # Create the shared session up front, every command then reuses its pool
+        get_client()
+        saved_stdout, sys.stdout = sys.stdout, output
+        try:
+            for _, _, error in run_concurrently(run_chain, list(chains.values()), workers):
+                if error:
+                    raise error
+        finally:
+            sys.stdout = saved_stdout
+        return len(commands), len(failed)
@@ -1,41 +1,87 @@
-from .user_management import UserManager
-from .config_management import ConfigManager
-from .state_management import StateManager
 import argparse
+import importlib
+import sys
+from .http_client import configure_client, DEFAULT_POOL_SIZE, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, DEFAULT_RETRIES, DEFAULT_RETRY_BACKOFF
+from .tracing import RequestTracer
 
-def main():
+# action -> (module, manager class, help). Managers are imported only for the
+# action being run, so --help and argument errors never load the HTTP stack.
+COMMANDS = {
+    "user": ("user_management", "UserManager", "User management commands"),
+    "config": ("config_management", "ConfigManager", "Configuration management commands"),
+    "state": ("state_management", "StateManager", "State management commands"),
+    "lock": ("lock_management", "LockManager", "Lock inspection and cleanup commands"),
+    "batch": ("batch", "BatchManager", "Run commands from a file or stdin over one session"),
+}
+
+def load_manager(action):
+    module_name, class_name, _ = COMMANDS[action]
+    module = importlib.import_module(f".{module_name}", __package__)
+    return getattr(module, class_name)
+
+def requested_action(parser, argv):
+    """Return the action named on the command line, skipping global options and their values."""
+    takes_value = {option for action in parser._actions if action.option_strings and action.nargs != 0
+                   for option in action.option_strings}
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg.startswith("-"):
+            # argparse also accepts unambiguous abbreviations such as --trace
+            skip = "=" not in arg and any(option.startswith(arg) for option in takes_value)
+        else:
+            return arg if arg in COMMANDS else None
+    return None
+
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Terraform State Manager Admin CLI")
     parser.add_argument("--debug", action="store_true", help="Enable debug output")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE, help="Maximum number of pooled HTTP connections")
+    parser.add_argument("--connect-timeout", type=float, default=DEFAULT_CONNECT_TIMEOUT, help="Connection timeout in seconds")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_READ_TIMEOUT, help="Read timeout in seconds")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="Retries for transient errors (5xx, 429, connection failures)")
+    parser.add_argument("--retry-backoff", type=float, default=DEFAULT_RETRY_BACKOFF, help="Base delay in seconds for exponential retry backoff")
+    parser.add_argument("--timings", action="store_true", help="Print a per-route timing summary of all HTTP calls to stderr")
+    parser.add_argument("--trace-file", help="Append one JSON line per HTTP call to this file")
     subparsers = parser.add_subparsers(dest="action", help="Action to perform", required=True)
 
-    # User management subparser
-    user_parser = subparsers.add_parser("user", help="User management commands")
-    user_subparsers = user_parser.add_subparsers(dest="user_action", required=True)
-    UserManager.add_parsers(user_subparsers)
+    # Every action gets a parser so top-level --help lists them all, but only
+    # the requested one is populated by its manager
+    argv = sys.argv[1:] if argv is None else list(argv)
+    action = requested_action(parser, argv)
+    for name, (_, _, help_text) in COMMANDS.items():
+        action_parser = subparsers.add_parser(name, help=help_text)
+        if name == action:
+            manager = load_manager(name)
+            # Managers without sub-actions take their arguments directly
+            if hasattr(manager, "add_arguments"):
+                manager.add_arguments(action_parser)
+            else:
+                action_subparsers = action_parser.add_subparsers(dest=f"{name}_action", required=True)
+                manager.add_parsers(action_subparsers)
 
-    # Config management subparser
-    config_parser = subparsers.add_parser("config", help="Configuration management commands")
-    config_subparsers = config_parser.add_subparsers(dest="config_action", required=True)
-    ConfigManager.add_parsers(config_subparsers)
+    # Add --username argument to the state list command
+    if action == "state":
+        state_list_parser = action_subparsers.choices.get('list')
+        if state_list_parser:
+            state_list_parser.add_argument("--username", help="Filter states by username")
 
-    # State management subparser
-    state_parser = subparsers.add_parser("state", help="State management commands")
-    state_subparsers = state_parser.add_subparsers(dest="state_action", required=True)
-    StateManager.add_parsers(state_subparsers)
+    args = parser.parse_args(argv)
+    tracer = RequestTracer(args.trace_file) if args.timings or args.trace_file else None
+    configure_client(pool_size=args.pool_size, connect_timeout=args.connect_timeout, read_timeout=args.timeout,
+                     retries=args.retries, retry_backoff=args.retry_backoff, tracer=tracer)
 
-    # Add --username argument to the state list command
-    state_list_parser = state_subparsers.choices.get('list')
-    if state_list_parser:
-        state_list_parser.add_argument("--username", help="Filter states by username")
-
-    args = parser.parse_args()
-
-    if args.action == "user":
-        UserManager.handle_action(args)
-    elif args.action == "config":
-        ConfigManager.handle_action(args)
-    elif args.action == "state":
-        StateManager.handle_action(args)
+    try:
+        ok = manager.handle_action(args)
+    finally:
+        if tracer:
+            tracer.close()
+            if args.timings:
+                tracer.print_summary()
+    # Every command reports failure by returning False
+    if not ok:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
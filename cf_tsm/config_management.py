@@ -1,7 +1,7 @@
-import requests
 import json
 import getpass
-from .utils import BASE_URL, get_auth_header
+from .api import TsmClient
+from .exceptions import ApiError
 
 class ConfigManager:
     @staticmethod
@@ -15,53 +15,39 @@ class ConfigManager:
     @staticmethod
     def handle_action(args):
         if args.config_action == "get":
-            ConfigManager.get_config()
+            return ConfigManager.get_config()
         elif args.config_action == "set":
-            ConfigManager.set_config(args.max_backups)
+            return ConfigManager.set_config(args.max_backups)
         elif args.config_action == "init-admin":
-            ConfigManager.init_admin(args.username)
+            return ConfigManager.init_admin(args.username, getattr(args, "password", None))
 
     @staticmethod
     def get_config():
-        url = f"{BASE_URL}/api/v1/config"
-        headers = {
-            "Authorization": get_auth_header()
-        }
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            config = response.json()
-            print(json.dumps(config, indent=2))
-        else:
-            print(f"Get config response: {response.status_code} - {response.text}")
+        try:
+            config = TsmClient().get_config()
+        except ApiError as error:
+            print(f"Get config response: {error}")
+            return False
+        print(json.dumps(config, indent=2))
+        return True
 
     @staticmethod
     def set_config(max_backups):
-        url = f"{BASE_URL}/api/v1/config"
-        headers = {
-            "Authorization": get_auth_header(),
-            "Content-Type": "application/json"
-        }
-        data = {
-            "maxBackups": max_backups
-        }
-        response = requests.post(url, headers=headers, json=data)
-        print(f"Set config response: {response.status_code} - {response.text}")
+        try:
+            print(f"Set config response: {TsmClient().set_config(max_backups)}")
+        except ApiError as error:
+            print(f"Set config response: {error}")
+            return False
+        return True
 
     @staticmethod
-    def init_admin(username):
-        password = getpass.getpass("Enter admin password: ")
-        url = f"{BASE_URL}/api/v1/users"
-        headers = {
-            "Authorization": get_auth_header(),
-            "Content-Type": "application/json"
-        }
-        data = {
-            "username": username,
-            "password": password,
-            "project": "all",
-            "role": "admin"
-        }
-        response = requests.post(url, headers=headers, json=data)
-        print(f"Init admin response: {response.status_code} - {response.text}")
-        if response.status_code != 201:
+    def init_admin(username, password=None):
+        if password is None:
+            password = getpass.getpass("Enter admin password: ")
+        try:
+            print(f"Init admin response: {TsmClient().create_user(username, password, 'all', 'admin')}")
+        except ApiError as error:
+            print(f"Init admin response: {error}")
             print("Failed to initialize admin user. Please check your authentication token and try again.")
+            return False
+        return True
@@ -0,0 +1,64 @@
+"""urllib3 connection classes that report DNS, connect and TLS time to the request tracer.
+
+Kept apart from :mod:`cf_tsm.tracing` so the HTTP stack is only imported
+when tracing is actually enabled.
+"""
+import socket
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from .tracing import add_phase_timing, phase_timings
+
+class TimedHTTPConnection(HTTPConnection):
+    """HTTPConnection that records DNS lookup and TCP connect time."""
+
+    def _new_conn(self):
+        host = self._dns_host
+        started = time.perf_counter()
+        try:
+            addresses = [info[4][0] for info in socket.getaddrinfo(host, self.port, type=socket.SOCK_STREAM)]
+        except socket.gaierror:
+            addresses = [host]  # let urllib3 raise its usual resolution error
+        add_phase_timing("dns", time.perf_counter() - started)
+
+        # Connect to the already resolved addresses in order, so the lookup
+        # is not repeated inside urllib3 and counted as connect time
+        addresses = list(dict.fromkeys(addresses))
+        started = time.perf_counter()
+        try:
+            for address in addresses[:-1]:
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except Exception:
+                    continue
+            self._dns_host = addresses[-1]
+            return super()._new_conn()
+        finally:
+            self._dns_host = host
+            add_phase_timing("connect", time.perf_counter() - started)
+
+class TimedHTTPSConnection(TimedHTTPConnection, HTTPSConnection):
+    """HTTPSConnection that additionally records the TLS handshake time."""
+
+    def connect(self):
+        started = time.perf_counter()
+        before = dict(phase_timings())
+        super().connect()
+        after = phase_timings()
+        setup = (after.get("dns", 0.0) - before.get("dns", 0.0)) + (after.get("connect", 0.0) - before.get("connect", 0.0))
+        add_phase_timing("tls", time.perf_counter() - started - setup)
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class TimingAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled connections report DNS, connect and TLS timings."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
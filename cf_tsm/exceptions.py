@@ -0,0 +1,63 @@
+class TsmError(Exception):
+    """Base class of all errors raised by the cf_tsm library API."""
+
+class ApiError(TsmError):
+    """The Worker answered with an error status."""
+
+    def __init__(self, status, message, path=None):
+        super().__init__(f"{status} - {message}")
+        self.status = status
+        self.message = message
+        self.path = path
+
+class AuthenticationError(ApiError):
+    """The credentials were missing, wrong or lack permission (401/403)."""
+
+class NotFoundError(ApiError):
+    """The requested state, user or backup slot does not exist (404)."""
+
+class LockedError(ApiError):
+    """The state lock is held by someone else (423); ``lock_info`` describes the holder."""
+
+    def __init__(self, status, message, path=None, lock_info=None):
+        super().__init__(status, message, path)
+        self.lock_info = lock_info or {}
+
+class LockTimeoutError(TsmError):
+    """A state lock was still held when waiting for it timed out."""
+
+    def __init__(self, message, lock_info=None):
+        super().__init__(message)
+        self.lock_info = lock_info or {}
+
+class TransportError(TsmError):
+    """The request got no response (connection failure or timeout); the requests exception is the ``__cause__``."""
+
+class CircuitOpenError(TsmError):
+    """Raised instead of sending a request while its endpoint's circuit breaker is open."""
+
+class BatchError(TsmError):
+    """Some items of a batch call failed; ``errors`` maps them to their exception, ``results`` holds the rest."""
+
+    def __init__(self, errors, results):
+        super().__init__(f"{len(errors)} of {len(errors) + len(results)} items failed: "
+                         + ", ".join(f"{item}: {error}" for item, error in sorted(errors.items())[:3])
+                         + (", ..." if len(errors) > 3 else ""))
+        self.errors = errors
+        self.results = results
+
+STATUS_ERRORS = {401: AuthenticationError, 403: AuthenticationError, 404: NotFoundError, 423: LockedError}
+
+def raise_for_status(response):
+    """Raise the ApiError subclass matching an error response; do nothing for success."""
+    if response.status_code < 400:
+        return
+    path = response.request.path_url if response.request is not None else None
+    error_class = STATUS_ERRORS.get(response.status_code, ApiError)
+    if error_class is LockedError:
+        try:
+            lock_info = response.json()
+        except ValueError:
+            lock_info = {}
+        raise LockedError(response.status_code, response.text, path, lock_info)
+    raise error_class(response.status_code, response.text, path)
@@ -0,0 +1,273 @@
+import os
+import random
+import threading
+import time
+from .exceptions import CircuitOpenError, TransportError
+from .tracing import route_template, pop_phase_timings
+from .utils import BASE_URL, get_auth_header
+
+DEFAULT_POOL_SIZE = int(os.environ.get("TSM_POOL_SIZE", "10"))
+DEFAULT_CONNECT_TIMEOUT = float(os.environ.get("TSM_CONNECT_TIMEOUT", "10"))
+DEFAULT_READ_TIMEOUT = float(os.environ.get("TSM_TIMEOUT", "60"))
+DEFAULT_RETRIES = int(os.environ.get("TSM_RETRIES", "3"))
+DEFAULT_RETRY_BACKOFF = float(os.environ.get("TSM_RETRY_BACKOFF", "0.5"))
+DEFAULT_BREAKER_THRESHOLD = int(os.environ.get("TSM_BREAKER_THRESHOLD", "5"))
+DEFAULT_BREAKER_RESET = float(os.environ.get("TSM_BREAKER_RESET", "30"))
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, so parallel clients spread their retries."""
+
+    def __init__(self, retries=DEFAULT_RETRIES, backoff=DEFAULT_RETRY_BACKOFF, max_backoff=30.0):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def delay(self, attempt, response=None):
+        """Seconds to wait before retry number attempt + 1, honouring Retry-After."""
+        retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+        if retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+class CircuitBreaker:
+    """Per-endpoint circuit breaker.
+
+    After ``threshold`` consecutive server errors or connection failures an
+    endpoint is short-circuited for ``reset_timeout`` seconds. A single trial
+    request then decides whether it closes again.
+    """
+
+    def __init__(self, threshold=DEFAULT_BREAKER_THRESHOLD, reset_timeout=DEFAULT_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._failures = {}
+        self._opened = {}
+        self._trials = set()
+        self._lock = threading.Lock()
+
+    def before_request(self, endpoint):
+        with self._lock:
+            opened = self._opened.get(endpoint)
+            if opened is None:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - opened)
+            if remaining > 0 or endpoint in self._trials:
+                raise CircuitOpenError(f"{endpoint} failed {self._failures[endpoint]} times in a row, "
+                                       f"not sending requests for another {max(remaining, 0):.0f}s")
+            self._trials.add(endpoint)
+
+    def record(self, endpoint, success):
+        with self._lock:
+            self._trials.discard(endpoint)
+            if success:
+                self._failures.pop(endpoint, None)
+                self._opened.pop(endpoint, None)
+                return
+            self._failures[endpoint] = self._failures.get(endpoint, 0) + 1
+            if self._failures[endpoint] >= self.threshold:
+                self._opened[endpoint] = time.monotonic()
+
+class HttpClient:
+    """Keep-alive HTTP client shared by all managers.
+
+    Wraps a single ``requests.Session`` so repeated calls reuse pooled
+    TCP/TLS connections to the Worker instead of reconnecting every time.
+    """
+
+    def __init__(self, base_url=BASE_URL, pool_size=DEFAULT_POOL_SIZE,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 auth_header=None, tracer=None, retries=DEFAULT_RETRIES, retry_backoff=DEFAULT_RETRY_BACKOFF,
+                 breaker_threshold=DEFAULT_BREAKER_THRESHOLD, breaker_reset=DEFAULT_BREAKER_RESET):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.retry_policy = RetryPolicy(retries, retry_backoff)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        # Imported here rather than at module level so commands that never
+        # reach the network (--help, argument errors) skip loading requests
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.exceptions import NewConnectionError
+
+        # Failures without a response; retried here, otherwise re-raised as TransportError
+        self.transport_errors = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+        self._connect_timeout_error = requests.exceptions.ConnectTimeout
+        self._new_connection_error = NewConnectionError
+
+        self.tracer = tracer
+        self.session = requests.Session()
+        # The timing adapter is only mounted when tracing, untraced runs keep the stock pool
+        if tracer:
+            from .connection_timing import TimingAdapter
+            adapter_class = TimingAdapter
+        else:
+            adapter_class = HTTPAdapter
+        adapter = adapter_class(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        auth_header = auth_header or get_auth_header()
+        if auth_header:
+            self.session.headers["Authorization"] = auth_header
+
+    def url(self, path):
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, retry=None, **kwargs):
+        """Send a request, retrying transient failures with backoff.
+
+        Server errors and 429s are retried for idempotent methods, or when the
+        caller passes ``retry=True``. Connection failures where nothing was
+        sent are retried for any method. Streamed generator bodies cannot be
+        replayed and are never retried. A connection failure or timeout that
+        is not retried is raised as TransportError.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        if retry is None:
+            retry = method in IDEMPOTENT_METHODS
+        endpoint = f"{method} {route_template(path)}"
+        data = kwargs.get("data")
+        rewind_to = data.tell() if hasattr(data, "seek") and hasattr(data, "tell") else None
+        replayable = rewind_to is not None or data is None or isinstance(data, (bytes, str, dict, list, tuple))
+
+        # The breaker counts logical requests; failed attempts that are retried do not count
+        self.breaker.before_request(endpoint)
+        attempt = 0
+        try:
+            while True:
+                try:
+                    response = self._send(method, path, kwargs, attempt)
+                except self.transport_errors as error:
+                    if attempt >= self.retry_policy.retries or not replayable or not (retry or self._never_sent(error)):
+                        raise TransportError(f"{method} {path} failed: {error}") from error
+                    delay = self.retry_policy.delay(attempt)
+                else:
+                    if (response.status_code not in RETRY_STATUSES or not retry or not replayable
+                            or attempt >= self.retry_policy.retries):
+                        self.breaker.record(endpoint, response.status_code < 500)
+                        return response
+                    delay = self.retry_policy.delay(attempt, response)
+                    response.close()
+                time.sleep(delay)
+                if rewind_to is not None:
+                    data.seek(rewind_to)
+                attempt += 1
+        except BaseException:
+            # Whatever ended the request without a response (a transport error,
+            # a redirect loop, an interrupt) counts as a failure, which also
+            # frees a half-open endpoint's trial slot
+            self.breaker.record(endpoint, False)
+            raise
+
+    def _never_sent(self, error):
+        """True if the request failed before a connection was established."""
+        if isinstance(error, self._connect_timeout_error):
+            return True
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(reason, self._new_connection_error)
+
+    def _send(self, method, path, kwargs, attempt):
+        if self.tracer is None:
+            return self.session.request(method, self.url(path), **kwargs)
+        return self._traced_request(method, path, dict(kwargs), attempt)
+
+    def _traced_request(self, method, path, kwargs, attempt=0):
+        sent = [0]
+        data = kwargs.get("data")
+        if data is not None and not isinstance(data, (bytes, str, dict, list, tuple)) and not hasattr(data, "read"):
+            def counting(chunks):
+                for chunk in chunks:
+                    sent[0] += len(chunk)
+                    yield chunk
+            kwargs["data"] = counting(data)
+
+        entry = {"method": method, "route": route_template(path), "path": path.split("?", 1)[0]}
+        pop_phase_timings()
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.url(path), **kwargs)
+        except Exception as error:
+            entry.update(self._phase_timings(None), status=None, retries=attempt, bytes_sent=sent[0], bytes_received=0,
+                         total_ms=(time.perf_counter() - started) * 1000, error=str(error))
+            self.tracer.record(entry)
+            raise
+
+        body = response.request.body
+        if isinstance(body, (bytes, str)):
+            sent[0] = len(body)
+        elif hasattr(body, "tell"):
+            sent[0] = body.tell()
+        entry.update(self._phase_timings(response.elapsed.total_seconds()), status=response.status_code,
+                     retries=attempt, bytes_sent=sent[0])
+
+        def finish():
+            entry["bytes_received"] = response.raw.tell()
+            entry["total_ms"] = (time.perf_counter() - started) * 1000
+            self.tracer.record(entry)
+
+        if not kwargs.get("stream"):
+            finish()
+            return response
+
+        # Streamed bodies are only complete once the caller closes the response
+        close = response.close
+
+        def traced_close():
+            if "total_ms" not in entry:
+                finish()
+            close()
+
+        response.close = traced_close
+        return response
+
+    @staticmethod
+    def _phase_timings(ttfb):
+        phases = pop_phase_timings()
+        return {
+            "dns_ms": phases.get("dns", 0.0) * 1000,
+            "connect_ms": phases.get("connect", 0.0) * 1000,
+            "tls_ms": phases.get("tls", 0.0) * 1000,
+            "ttfb_ms": None if ttfb is None else ttfb * 1000,
+        }
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request("DELETE", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+_client = None
+_client_options = {}
+_client_lock = threading.Lock()
+
+def configure_client(**kwargs):
+    """Set the options for the shared client, e.g. CLI-supplied pool size and timeouts.
+
+    The client itself is created on first use by get_client().
+    """
+    global _client, _client_options
+    if _client is not None:
+        _client.close()
+        _client = None
+    _client_options = kwargs
+
+def get_client():
+    """Return the process-wide client, creating it on first use."""
+    global _client
+    if _client is None:
+        # Batch commands and other worker threads may race to create it
+        with _client_lock:
+            if _client is None:
+                _client = HttpClient(**_client_options)
+    return _client
@@ -0,0 +1,148 @@
+from datetime import datetime, timezone
+from .api import TsmClient
+from .exceptions import LockedError
+from .state_management import StateManager
+from .utils import debug_print, run_concurrently, parse_duration, parse_timestamp, DEFAULT_LOCK_WAIT, DEFAULT_WORKERS
+
+class LockManager:
+    @staticmethod
+    def add_parsers(subparsers):
+        status_parser = subparsers.add_parser("status", help="Show lock status of all states")
+        status_parser.add_argument("--project", help="Only check states of this project")
+        status_parser.add_argument("--locked-only", action="store_true", help="Only show locked states")
+        status_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of concurrent requests")
+
+        release_parser = subparsers.add_parser("release", help="Release the lock of a state")
+        release_parser.add_argument("project", help="Project name")
+        release_parser.add_argument("state_path", help="State path")
+        release_parser.add_argument("--id", help="Only release the lock if it has this ID")
+
+        sweep_parser = subparsers.add_parser("sweep", help="Release locks older than a given age")
+        sweep_parser.add_argument("--older-than", required=True, type=parse_duration, help="Minimum lock age, e.g. 90s, 30m, 2h or 1d")
+        sweep_parser.add_argument("--project", help="Only sweep states of this project")
+        sweep_parser.add_argument("--dry-run", action="store_true", help="Show which locks would be released")
+        sweep_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of concurrent requests")
+
+    @staticmethod
+    def handle_action(args):
+        if args.lock_action == "status":
+            return LockManager.lock_status(args.project, args.locked_only, args.workers, args.debug)
+        elif args.lock_action == "release":
+            return LockManager.release(args.project, args.state_path, args.id, args.debug)
+        elif args.lock_action == "sweep":
+            return LockManager.sweep(args.older_than, args.project, args.dry_run, args.workers, args.debug)
+
+    @staticmethod
+    def get_lock(key):
+        """Return the lock info for a state key, or None if it is not locked."""
+        return TsmClient().get_lock(*key.split("/", 1))
+
+    @staticmethod
+    def release_lock(key, lock_id=None):
+        TsmClient().release_lock(*key.split("/", 1), lock_id)
+
+    @staticmethod
+    def acquire_lock(key, lock_info):
+        """Try once to take the lock; return None on success or the current holder's lock info."""
+        try:
+            TsmClient().acquire_lock(*key.split("/", 1), lock_info)
+        except LockedError as error:
+            return error.lock_info
+        return None
+
+    @staticmethod
+    def wait_for_lock(key, timeout=DEFAULT_LOCK_WAIT, operation="tsm-admin", debug=False):
+        """Take the lock of a state, see TsmClient.wait_for_lock; returns the lock ID to release with release_lock."""
+        debug_print(f"Waiting up to {timeout:.0f}s for the lock on {key}", debug)
+        return TsmClient().wait_for_lock(*key.split("/", 1), timeout, operation)
+
+    @staticmethod
+    def lock_age(lock_info):
+        """Seconds since the lock was created, or None if the timestamp is missing or invalid."""
+        try:
+            created = parse_timestamp(lock_info.get("Created") or "")
+        except ValueError:
+            return None
+        return (datetime.now(timezone.utc) - created).total_seconds()
+
+    @staticmethod
+    def collect_locks(project=None, workers=DEFAULT_WORKERS, debug=False):
+        """Check every state concurrently and return (locks by key, errors by key)."""
+        keys = StateManager.fetch_state_keys(project, include_backups=False, debug=debug)
+        locks, errors = {}, {}
+        for key, lock_info, error in run_concurrently(LockManager.get_lock, keys, workers):
+            if error:
+                errors[key] = error
+            else:
+                locks[key] = lock_info
+            debug_print(f"Lock status for {key}: {error or lock_info}", debug)
+        return locks, errors
+
+    @staticmethod
+    def lock_status(project=None, locked_only=False, workers=DEFAULT_WORKERS, debug=False):
+        try:
+            locks, errors = LockManager.collect_locks(project, workers, debug)
+        except Exception as error:
+            print(f"Error listing states: {error}")
+            return False
+        print(f"{'STATUS':<8}  {'AGE':>10}  {'WHO':<24}  {'ID':<36}  KEY")
+        for key in sorted(locks):
+            lock_info = locks[key]
+            if lock_info is None:
+                if not locked_only:
+                    print(f"{'free':<8}  {'':>10}  {'':<24}  {'':<36}  {key}")
+                continue
+            age = LockManager.lock_age(lock_info)
+            age_text = "" if age is None else f"{int(age)}s"
+            print(f"{'locked':<8}  {age_text:>10}  {lock_info.get('Who', ''):<24}  {lock_info.get('ID', ''):<36}  {key}")
+        for key in sorted(errors):
+            print(f"{'error':<8}  {'':>10}  {'':<24}  {'':<36}  {key}: {errors[key]}")
+        locked = sum(1 for lock_info in locks.values() if lock_info)
+        print(f"{locked} of {len(locks) + len(errors)} states locked, {len(errors)} could not be checked.")
+        return not errors
+
+    @staticmethod
+    def release(project, state_path, lock_id=None, debug=False):
+        key = f"{project}/{state_path}"
+        try:
+            LockManager.release_lock(key, lock_id)
+        except Exception as error:
+            print(f"Error releasing lock for {key}: {error}")
+            return False
+        print(f"Lock released for {key}")
+        return True
+
+    @staticmethod
+    def sweep(older_than, project=None, dry_run=False, workers=DEFAULT_WORKERS, debug=False):
+        try:
+            locks, errors = LockManager.collect_locks(project, workers, debug)
+        except Exception as error:
+            print(f"Error listing states: {error}")
+            return False
+
+        stale = {}
+        for key, lock_info in locks.items():
+            age = LockManager.lock_age(lock_info) if lock_info else None
+            if age is not None and age >= older_than:
+                stale[key] = lock_info
+        if dry_run:
+            for key in sorted(stale):
+                print(f"  Would release {key} (ID {stale[key].get('ID')}, held by {stale[key].get('Who')})")
+            print(f"{len(stale)} stale locks found.")
+            return not errors
+
+        # Pass the lock ID so a lock re-acquired since the scan is left alone
+        def release(key):
+            LockManager.release_lock(key, stale[key].get("ID"))
+
+        failed = {}
+        for key, _, error in run_concurrently(release, sorted(stale), workers):
+            if error:
+                failed[key] = error
+            else:
+                print(f"  Released {key} (ID {stale[key].get('ID')}, held by {stale[key].get('Who')})")
+        for key in sorted(failed):
+            print(f"  Failed to release {key}: {failed[key]}")
+        print(f"Released {len(stale) - len(failed)} of {len(stale)} stale locks, "
+              f"{len(failed)} failed, {len(errors)} states could not be checked.")
+        return not failed and not errors
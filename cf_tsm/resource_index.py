@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import time
+from .state_cache import DEFAULT_CACHE_DIR
+from .state_diff import iter_resource_instances
+
+DEFAULT_INDEX_PATH = os.environ.get("TSM_INDEX_PATH", os.path.join(DEFAULT_CACHE_DIR, "resources.sqlite"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS states (
+    key TEXT PRIMARY KEY,
+    project TEXT NOT NULL,
+    state_path TEXT NOT NULL,
+    etag TEXT,
+    sha256 TEXT NOT NULL,
+    serial INTEGER,
+    lineage TEXT,
+    size INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS resources (
+    state_key TEXT NOT NULL REFERENCES states(key) ON DELETE CASCADE,
+    address TEXT NOT NULL,
+    mode TEXT,
+    type TEXT,
+    provider TEXT
+);
+CREATE INDEX IF NOT EXISTS resources_state_key ON resources(state_key);
+CREATE INDEX IF NOT EXISTS resources_type ON resources(type);
+CREATE INDEX IF NOT EXISTS resources_address ON resources(address);
+"""
+
+def resource_rows(document):
+    """Reduce a parsed state to (address, mode, type, provider) rows, one per resource instance."""
+    rows = []
+    for address, resource, _ in iter_resource_instances(document):
+        # Version 3 states carry no mode, data sources are only marked in the address
+        mode = resource.get("mode") or ("data" if ".data." in f".{address}" else "managed")
+        rows.append((address, mode, resource.get("type"), resource.get("provider")))
+    return rows
+
+class ResourceIndex:
+    """Local SQLite index of the resources managed by every state.
+
+    One row per state records its ETag, content hash, serial, lineage and size,
+    so a refresh only downloads and re-parses states whose content changed.
+    Queries run entirely against the local file.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        # States contain secrets and addresses hint at them, keep the index private
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def known_states(self, project=None):
+        """Return {key: (etag, sha256)} for indexed states, optionally of one project."""
+        if project:
+            rows = self.db.execute("SELECT key, etag, sha256 FROM states WHERE project = ?", (project,))
+        else:
+            rows = self.db.execute("SELECT key, etag, sha256 FROM states")
+        return {key: (etag, sha256) for key, etag, sha256 in rows}
+
+    def update_etag(self, key, etag):
+        with self.db:
+            self.db.execute("UPDATE states SET etag = ?, indexed_at = ? WHERE key = ?", (etag, time.time(), key))
+
+    def store_state(self, key, etag, sha256, size, serial, lineage, rows):
+        """Replace the indexed resources of one state with ``resource_rows`` output and return their number."""
+        project, _, state_path = key.partition("/")
+        with self.db:
+            self.db.execute("DELETE FROM resources WHERE state_key = ?", (key,))
+            self.db.execute(
+                "INSERT OR REPLACE INTO states (key, project, state_path, etag, sha256, serial, lineage, size, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, project, state_path, etag, sha256, serial, lineage, size, time.time()))
+            self.db.executemany("INSERT INTO resources (state_key, address, mode, type, provider) VALUES (?, ?, ?, ?, ?)",
+                                [(key,) + row for row in rows])
+        return len(rows)
+
+    def remove_states(self, keys):
+        with self.db:
+            self.db.executemany("DELETE FROM resources WHERE state_key = ?", [(key,) for key in keys])
+            self.db.executemany("DELETE FROM states WHERE key = ?", [(key,) for key in keys])
+
+    def query(self, resource_type=None, address=None, provider=None, project=None, limit=None):
+        """Find resource instances by exact type, address (with * and ? wildcards) and provider substring."""
+        # Addresses contain brackets, which GLOB treats as character classes,
+        # so only use it when the caller actually asked for a wildcard
+        address_clause = "r.address GLOB ?" if address and any(c in address for c in "*?") else "r.address = ?"
+        conditions, params = [], []
+        for clause, value in (("r.type = ?", resource_type), (address_clause, address),
+                              ("instr(r.provider, ?) > 0", provider), ("s.project = ?", project)):
+            if value:
+                conditions.append(clause)
+                params.append(value)
+        sql = ("SELECT s.project, s.state_path, s.serial, s.lineage, s.size, r.address, r.type, r.provider "
+               "FROM resources r JOIN states s ON s.key = r.state_key")
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY s.key, r.address"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        columns = ["project", "state_path", "serial", "lineage", "size", "address", "type", "provider"]
+        return [dict(zip(columns, row)) for row in self.db.execute(sql, params)]
+
+    def stats(self):
+        states, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM states").fetchone()
+        resources, = self.db.execute("SELECT COUNT(*) FROM resources").fetchone()
+        return {"states": states, "resources": resources, "bytes": size}
@@ -0,0 +1,154 @@
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+from .utils import copy_stream
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads within one process are serialized
+    fcntl = None
+
+DEFAULT_CACHE_DIR = os.environ.get("TSM_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "cf_tsm"))
+DEFAULT_MAX_BYTES = int(os.environ.get("TSM_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+DEFAULT_MAX_AGE = float(os.environ.get("TSM_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+# Bodies are written before their index entry, so a fresh unreferenced object
+# may belong to a store still in progress in another process
+ORPHAN_GRACE_PERIOD = 600.0
+
+class StateCache:
+    """On-disk cache of state bodies keyed by ``project/state_path``.
+
+    Bodies are stored once per SHA-256 under ``objects/`` and the index maps
+    each key to its body hash and the ETag it was fetched with, so a cached
+    read only costs a conditional GET that the Worker answers with 304.
+
+    Several processes may share one cache: every change re-reads the index
+    while holding an exclusive lock on ``index.lock`` and writes it back
+    before releasing it.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE,
+                 grace_period=ORPHAN_GRACE_PERIOD):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.grace_period = grace_period
+        self.objects_dir = os.path.join(root, "objects")
+        self.index_path = os.path.join(root, "index.json")
+        self.lock_path = os.path.join(root, "index.lock")
+        self._lock = threading.Lock()
+        # States contain secrets, keep the cache private to the current user
+        os.makedirs(root, mode=0o700, exist_ok=True)
+        os.makedirs(self.objects_dir, mode=0o700, exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @contextlib.contextmanager
+    def _locked_index(self):
+        """Hold the thread and file locks with the index freshly loaded; save it on exit."""
+        with self._lock:
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                self._index = self._load_index()
+                yield self._index
+                self._save_index()
+            finally:
+                # Closing the descriptor also drops the flock
+                os.close(fd)
+
+    def _save_index(self):
+        fd, temp_path = tempfile.mkstemp(dir=self.root)
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._index, f)
+        os.replace(temp_path, self.index_path)
+
+    def body_path(self, entry):
+        return os.path.join(self.objects_dir, entry["sha256"])
+
+    def lookup(self, key):
+        """Return the index entry for key if its body is still on disk."""
+        with self._lock:
+            self._index = self._load_index()
+            entry = self._index.get(key)
+            if entry and os.path.exists(self.body_path(entry)):
+                return dict(entry)
+            return None
+
+    def touch(self, key):
+        """Mark a cached entry as revalidated and recently used."""
+        with self._locked_index() as index:
+            entry = index.get(key)
+            if entry:
+                entry["validated"] = entry["accessed"] = time.time()
+
+    def store(self, key, etag, chunks):
+        """Stream a fresh body into the cache and return its index entry."""
+        fd, temp_path = tempfile.mkstemp(dir=self.root)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                size, sha256 = copy_stream(chunks, f)
+            os.replace(temp_path, os.path.join(self.objects_dir, sha256))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        now = time.time()
+        entry = {"etag": etag, "sha256": sha256, "size": size, "validated": now, "accessed": now}
+        with self._locked_index() as index:
+            index[key] = entry
+        return dict(entry)
+
+    def evict(self):
+        """Drop entries not revalidated within max_age, then least recently used ones until under max_bytes.
+
+        Bodies no entry refers to are deleted once they are older than the grace period.
+        """
+        with self._locked_index() as index:
+            now = time.time()
+            cutoff = now - self.max_age
+            for key in [key for key, entry in index.items() if entry["validated"] < cutoff]:
+                del index[key]
+
+            by_hash = {}
+            for entry in index.values():
+                by_hash[entry["sha256"]] = entry["size"]
+            total = sum(by_hash.values())
+            for key, entry in sorted(index.items(), key=lambda item: item[1]["accessed"]):
+                if total <= self.max_bytes:
+                    break
+                del index[key]
+                if not any(other["sha256"] == entry["sha256"] for other in index.values()):
+                    total -= by_hash.pop(entry["sha256"])
+
+            referenced = {entry["sha256"] for entry in index.values()}
+            for name in os.listdir(self.objects_dir):
+                path = os.path.join(self.objects_dir, name)
+                if name in referenced:
+                    continue
+                try:
+                    if os.path.getmtime(path) < now - self.grace_period:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def clear(self):
+        with self._locked_index() as index:
+            index.clear()
+            for name in os.listdir(self.objects_dir):
+                os.remove(os.path.join(self.objects_dir, name))
+
+    def stats(self):
+        with self._lock:
+            self._index = self._load_index()
+            sizes = {entry["sha256"]: entry["size"] for entry in self._index.values()}
+            return {"entries": len(self._index), "objects": len(sizes), "bytes": sum(sizes.values())}
@@ -0,0 +1,71 @@
+"""Resource-level comparison of two Terraform state documents.
+
+Both states are indexed by resource instance address first, so a diff costs
+one pass over each state plus one equality check per shared address, no
+matter how large the states are.
+"""
+
+def _index_suffix(index_key):
+    if index_key is None:
+        return ""
+    if isinstance(index_key, str):
+        return f'["{index_key}"]'
+    return f"[{index_key}]"
+
+def iter_resource_instances(state):
+    """Yield (address, resource, instance) for every resource instance in a state.
+
+    Handles format version 4 (Terraform 0.12+) and the older version 3 layout
+    with per-module resource maps, where resource and instance are the same object.
+    """
+    if "modules" in state and "resources" not in state:
+        for module in state.get("modules") or []:
+            prefix = "".join(f"module.{name}." for name in (module.get("path") or ["root"])[1:])
+            for address, resource in (module.get("resources") or {}).items():
+                yield prefix + address, resource, resource
+        return
+
+    for resource in state.get("resources") or []:
+        prefix = f"{resource['module']}." if resource.get("module") else ""
+        if resource.get("mode") == "data":
+            prefix += "data."
+        base = f"{prefix}{resource.get('type')}.{resource.get('name')}"
+        for instance in resource.get("instances") or []:
+            yield base + _index_suffix(instance.get("index_key")), resource, instance
+
+def index_resources(state):
+    """Map every resource instance address in a state to its instance object."""
+    return {address: instance for address, _, instance in iter_resource_instances(state)}
+
+def index_outputs(state):
+    if "modules" in state and "outputs" not in state:
+        for module in state.get("modules") or []:
+            if (module.get("path") or ["root"]) == ["root"]:
+                return module.get("outputs") or {}
+        return {}
+    return state.get("outputs") or {}
+
+def changed_attributes(old, new):
+    """Names of top-level attributes whose values differ between two instances."""
+    old_attributes = old.get("attributes") or old.get("primary", {}).get("attributes") or {}
+    new_attributes = new.get("attributes") or new.get("primary", {}).get("attributes") or {}
+    return sorted(name for name in set(old_attributes) | set(new_attributes)
+                  if old_attributes.get(name) != new_attributes.get(name))
+
+def changed_output_fields(old, new):
+    """Which of an output's value, type and sensitive flag differ."""
+    return sorted(field for field in set(old) | set(new) if old.get(field) != new.get(field))
+
+def _diff_maps(old, new, describe):
+    added = sorted(set(new) - set(old))
+    removed = sorted(set(old) - set(new))
+    changed = {key: describe(old[key], new[key]) for key in sorted(set(old) & set(new)) if old[key] != new[key]}
+    return {"added": added, "removed": removed, "changed": changed}
+
+def diff_states(old, new):
+    """Compare two parsed states and return added, removed and changed resources and outputs."""
+    return {
+        "resources": _diff_maps(index_resources(old), index_resources(new), changed_attributes),
+        # Only the changed fields are reported, output values may be sensitive
+        "outputs": _diff_maps(index_outputs(old), index_outputs(new), changed_output_fields),
+    }
@@ -1,138 +1,981 @@
-import requests
-from .utils import BASE_URL, get_auth_header, debug_print
+import functools
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+from datetime import datetime, timezone
+from .api import TsmClient, BACKUP_SUFFIX_RE, is_backup_key
+from .exceptions import AuthenticationError, NotFoundError, TsmError
+from .http_client import get_client
+from .resource_index import ResourceIndex, DEFAULT_INDEX_PATH, resource_rows
+from .state_cache import StateCache
+from .state_diff import diff_states
+from .state_verify import check_chain, check_object, slot_label
+from .utils import debug_print, parse_duration, run_concurrently, copy_stream, format_transfer, CHUNK_SIZE, DEFAULT_LOCK_WAIT, DEFAULT_WORKERS
+
+SYNC_MANIFEST = ".tsm-sync.json"
+ARCHIVE_FORMATS = {"zip": ".zip", "tar": ".tar", "tar.gz": ".tar.gz"}
 
 class StateManager:
     @staticmethod
     def add_parsers(subparsers):
         list_states_parser = subparsers.add_parser("list", help="List Terraform states")
         list_states_parser.add_argument("--project", help="Filter states by project")
+        list_states_parser.add_argument("--prefix", help="Only list keys starting with this prefix (relative to --project if given)")
+        list_states_parser.add_argument("--limit", type=int, help="Maximum number of states to list")
+        list_states_parser.add_argument("--exclude-backups", action="store_true", help="Hide rotated backup copies (<state>.N)")
+        list_states_parser.add_argument("--format", choices=["text", "ndjson", "table"], default="text", help="Output format")
 
         get_state_parser = subparsers.add_parser("get", help="Get a specific Terraform state")
         get_state_parser.add_argument("project", help="Project name")
         get_state_parser.add_argument("state_path", help="State path")
+        get_state_parser.add_argument("--output", help="Stream the state to this file instead of stdout")
+        get_state_parser.add_argument("--cache", action="store_true", help="Serve the state from the local cache after revalidating it with the server")
+
+        cache_parser = subparsers.add_parser("cache", help="Show or clear the local state cache")
+        cache_parser.add_argument("--clear", action="store_true", help="Remove all cached states")
 
         set_state_parser = subparsers.add_parser("set", help="Set a Terraform state")
         set_state_parser.add_argument("project", help="Project name")
         set_state_parser.add_argument("state_path", help="State path")
         set_state_parser.add_argument("file", help="Path to the state file")
+        set_state_parser.add_argument("--compress", action="store_true", help="Gzip the state while uploading")
+        set_state_parser.add_argument("--force", action="store_true", help="Upload even if the remote state is identical")
+        set_state_parser.add_argument("--wait-lock", nargs="?", const=DEFAULT_LOCK_WAIT, type=parse_duration, metavar="TIMEOUT",
+                                      help="Take the state lock first, waiting up to TIMEOUT (default TSM_LOCK_WAIT or 5m) while it is held")
 
         delete_state_parser = subparsers.add_parser("delete", help="Delete a Terraform state")
         delete_state_parser.add_argument("project", help="Project name")
         delete_state_parser.add_argument("state_path", help="State path")
+        delete_state_parser.add_argument("--wait-lock", nargs="?", const=DEFAULT_LOCK_WAIT, type=parse_duration, metavar="TIMEOUT",
+                                         help="Take the state lock first, waiting up to TIMEOUT (default TSM_LOCK_WAIT or 5m) while it is held")
+
+        download_parser = subparsers.add_parser("download", help="Download all Terraform states")
+        download_parser.add_argument("--output", default="terraform_states_backup.zip", help="Path of the backup zip (partial downloads are resumed)")
+
+        sync_parser = subparsers.add_parser("sync", help="Incrementally mirror Terraform states into a local directory")
+        sync_parser.add_argument("directory", help="Local mirror directory")
+        sync_parser.add_argument("--project", help="Only mirror states of this project")
+        sync_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of concurrent downloads")
+        sync_parser.add_argument("--exclude-backups", action="store_true", help="Skip rotated backup copies (<state>.N)")
+
+        push_all_parser = subparsers.add_parser("push-all", help="Upload all states from a directory tree or backup zip in parallel")
+        push_all_parser.add_argument("source", help="Directory laid out as <project>/<state_path>, or a zip from 'state download'/'state pull-all'")
+        push_all_parser.add_argument("--project", help="Only push states of this project")
+        push_all_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of concurrent uploads")
+        push_all_parser.add_argument("--include-backups", action="store_true", help="Also upload rotated backup copies (<state>.N) as states")
+        push_all_parser.add_argument("--compress", action="store_true", help="Gzip states while uploading")
+        push_all_parser.add_argument("--report", help="Write a JSON report of per-state results to this file")
+        push_all_parser.add_argument("--force", action="store_true", help="Upload states even if the server already holds identical content")
+
+        pull_all_parser = subparsers.add_parser("pull-all", help="Download all Terraform states in parallel into a local archive")
+        pull_all_parser.add_argument("--project", help="Only pull states of this project")
+        pull_all_parser.add_argument("--output", help="Archive path (default: terraform_states_backup.<format>)")
+        pull_all_parser.add_argument("--format", choices=list(ARCHIVE_FORMATS), default="zip", help="Archive format")
+        pull_all_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of concurrent downloads")
+        pull_all_parser.add_argument("--exclude-backups", action="store_true", help="Skip rotated backup copies (<state>.N)")
+
+        diff_parser = subparsers.add_parser("diff", help="Compare a state with one of its rotated backups by resource address")
+        diff_parser.add_argument("project", help="Project name")
+        diff_parser.add_argument("state_path", help="State path")
+        diff_parser.add_argument("--against", type=int, default=1, help="Backup slot to compare against (<state>.N), default 1")
+        diff_parser.add_argument("--format", choices=["text", "json"], default="text", help="Output format")
+
+        index_parser = subparsers.add_parser("index", help="Build or refresh the local resource index of all states")
+        index_parser.add_argument("--project", help="Only index states of this project")
+        index_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of concurrent downloads")
+        index_parser.add_argument("--include-backups", action="store_true", help="Also index rotated backup copies (<state>.N)")
+        index_parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="Index database path (default: TSM_INDEX_PATH or the cache directory)")
 
-        subparsers.add_parser("download", help="Download all Terraform states")
+        query_parser = subparsers.add_parser("query", help="Find resources in the local index without contacting the server")
+        query_parser.add_argument("--type", help="Resource type, e.g. aws_s3_bucket")
+        query_parser.add_argument("--address", help="Resource address, * and ? act as wildcards")
+        query_parser.add_argument("--provider", help="Provider name substring, e.g. hashicorp/aws")
+        query_parser.add_argument("--project", help="Only search states of this project")
+        query_parser.add_argument("--limit", type=int, help="Maximum number of results")
+        query_parser.add_argument("--format", choices=["text", "ndjson"], default="text", help="Output format")
+        query_parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="Index database path (default: TSM_INDEX_PATH or the cache directory)")
+
+        history_parser = subparsers.add_parser("history", help="Show the current state and its rotated backups")
+        history_parser.add_argument("project", help="Project name")
+        history_parser.add_argument("state_path", help="State path")
+        history_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of concurrent downloads")
+        history_parser.add_argument("--format", choices=["text", "json"], default="text", help="Output format")
+
+        rollback_parser = subparsers.add_parser("rollback", help="Restore a rotated backup as the current state")
+        rollback_parser.add_argument("project", help="Project name")
+        rollback_parser.add_argument("state_path", help="State path")
+        rollback_parser.add_argument("--to", type=int, required=True, help="Backup slot to restore (<state>.N)")
+        rollback_parser.add_argument("--force", action="store_true", help="Roll back even if the state is locked or the lineage differs")
+
+        watch_parser = subparsers.add_parser("watch", help="Poll for state changes and print them as JSON lines")
+        watch_parser.add_argument("--project", help="Only watch states of this project")
+        watch_parser.add_argument("--interval", type=parse_duration, default=parse_duration("10s"), help="Polling interval after a change (default: 10s)")
+        watch_parser.add_argument("--max-interval", type=parse_duration, default=parse_duration("5m"), help="Longest interval to back off to while nothing changes (default: 5m)")
+        watch_parser.add_argument("--include-backups", action="store_true", help="Also report rotated backups")
+        watch_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of concurrent downloads of changed states")
+        watch_parser.add_argument("--polls", type=int, help="Stop after this many polls")
+
+        verify_parser = subparsers.add_parser("verify", help="Check all states and backups for corruption and inconsistent history")
+        verify_parser.add_argument("--project", help="Only verify states of this project")
+        verify_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of concurrent downloads")
+        verify_parser.add_argument("--format", choices=["text", "json"], default="text", help="Output format")
+        verify_parser.add_argument("--report", help="Also write the JSON report to this file")
 
     @staticmethod
     def handle_action(args):
         if args.state_action == "list":
-            StateManager.list_states(args.project, args.debug)
+            return StateManager.list_states(args.project, args.debug, args.prefix, args.limit, not args.exclude_backups, args.format)
         elif args.state_action == "get":
-            StateManager.get_state(args.project, args.state_path, args.debug)
+            return StateManager.get_state(args.project, args.state_path, args.debug, args.output, args.cache)
         elif args.state_action == "set":
-            StateManager.set_state(args.project, args.state_path, args.file, args.debug)
+            return StateManager.set_state(args.project, args.state_path, args.file, args.debug, args.compress, args.force, args.wait_lock)
         elif args.state_action == "delete":
-            StateManager.delete_state(args.project, args.state_path, args.debug)
+            return StateManager.delete_state(args.project, args.state_path, args.debug, args.wait_lock)
         elif args.state_action == "download":
-            StateManager.download_all_states(args.debug)
-
-    @staticmethod
-    def list_states(project=None, debug=False):
-        url = f"{BASE_URL}/api/v1/states"
-        headers = {
-            "Authorization": get_auth_header()
-        }
-        params = {}
-        if project:
-            params['project'] = project
-
-        debug_print(f"Sending request to {url}", debug)
-        debug_print(f"Headers: {headers}", debug)
-        debug_print(f"Params: {params}", debug)
-
-        response = requests.get(url, headers=headers, params=params)
-        debug_print(f"Response status code: {response.status_code}", debug)
-        debug_print(f"Response content: {response.text}", debug)
-
-        if response.status_code == 200:
-            states = response.json()
-            if states:
-                print("States:")
-                for state in states:
-                    print(f"  {state}")
+            return StateManager.download_all_states(args.debug, args.output)
+        elif args.state_action == "cache":
+            return StateManager.manage_cache(args.clear)
+        elif args.state_action == "sync":
+            return StateManager.sync_states(args.directory, args.project, args.workers, args.exclude_backups, args.debug)
+        elif args.state_action == "push-all":
+            return StateManager.push_all(args.source, args.project, args.workers, args.include_backups, args.compress, args.report,
+                                         args.debug, args.force)
+        elif args.state_action == "pull-all":
+            return StateManager.pull_all(args.project, args.output, args.format, args.workers, args.exclude_backups, args.debug)
+        elif args.state_action == "diff":
+            return StateManager.diff_state(args.project, args.state_path, args.against, args.format, args.debug)
+        elif args.state_action == "history":
+            return StateManager.state_history(args.project, args.state_path, args.workers, args.format, args.debug)
+        elif args.state_action == "rollback":
+            return StateManager.rollback_state(args.project, args.state_path, args.to, args.force, args.debug)
+        elif args.state_action == "index":
+            return StateManager.index_states(args.project, args.workers, args.include_backups, args.index, args.debug)
+        elif args.state_action == "query":
+            return StateManager.query_index(args.type, args.address, args.provider, args.project, args.limit, args.format, args.index)
+        elif args.state_action == "watch":
+            return StateManager.watch_states(args.project, args.interval, args.max_interval, args.include_backups, args.workers,
+                                             args.polls, args.debug)
+        elif args.state_action == "verify":
+            report = StateManager.verify_states(args.project, args.workers, args.format, args.report, args.debug)
+            return report is not None and not report["failed"]
+
+    @staticmethod
+    def is_backup_key(key):
+        return is_backup_key(key)
+
+    @staticmethod
+    def iter_state_pages(project=None, prefix=None, include_backups=True, limit=None, page_size=1000, debug=False):
+        """Yield stored states one listing page at a time, see TsmClient.iter_state_pages. Raises on HTTP errors."""
+        debug_print(f"Listing states (project={project}, prefix={prefix}, limit={limit})", debug)
+        yield from TsmClient().iter_state_pages(project, prefix, include_backups, limit, page_size)
+
+    @staticmethod
+    def iter_state_entries(project=None, prefix=None, include_backups=True, limit=None, debug=False):
+        for page in StateManager.iter_state_pages(project, prefix, include_backups, limit, debug=debug):
+            yield from page
+
+    @staticmethod
+    def fetch_state_entries(project=None, include_backups=True, debug=False):
+        """Return all stored states as a list of entries, see iter_state_entries."""
+        return list(StateManager.iter_state_entries(project, include_backups=include_backups, debug=debug))
+
+    @staticmethod
+    def fetch_state_keys(project=None, include_backups=True, debug=False):
+        """Return the list of stored state keys, raising on HTTP errors."""
+        return [entry["key"] for entry in StateManager.fetch_state_entries(project, include_backups, debug)]
+
+    @staticmethod
+    def _print_state_page(page, output_format, printed):
+        for entry in page:
+            if output_format == "ndjson":
+                print(json.dumps(entry))
+            elif output_format == "table":
+                if printed == 0:
+                    print(f"{'SIZE':>12}  {'UPLOADED':<24}  KEY")
+                size = entry.get("size")
+                print(f"{'' if size is None else size:>12}  {entry.get('uploaded') or '':<24}  {entry['key']}")
             else:
-                print("No states found.")
-        elif response.status_code == 401:
+                if printed == 0:
+                    print("States:")
+                print(f"  {entry['key']}")
+            printed += 1
+
+    @staticmethod
+    def list_states(project=None, debug=False, prefix=None, limit=None, include_backups=True, output_format="text"):
+        # Entries are printed as pages arrive so pipes start receiving output immediately
+        count = 0
+        try:
+            for page in StateManager.iter_state_pages(project, prefix, include_backups, limit, debug=debug):
+                StateManager._print_state_page(page, output_format, count)
+                count += len(page)
+                sys.stdout.flush()
+        except BrokenPipeError:
+            # The reader (e.g. head) went away; silence the flush at interpreter exit
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return True
+        except AuthenticationError:
             print("Error: Unauthorized. Please check your authentication credentials.")
-        else:
-            print(f"Error listing states: {response.status_code} - {response.text}")
+            return False
+        except Exception as error:
+            print(f"Error listing states: {error}")
+            return False
+        if count == 0 and output_format == "text":
+            print("No states found.")
+        return True
 
     @staticmethod
-    def get_state(project, state_path, debug=False):
-        url = f"{BASE_URL}/api/v1/states/{project}/{state_path}"
-        headers = {
-            "Authorization": get_auth_header()
-        }
-        debug_print(f"Sending request to {url}", debug)
-        debug_print(f"Headers: {headers}", debug)
+    def download_to_file(path, output, debug=False):
+        """Stream a GET response body to output in fixed-size chunks.
 
-        response = requests.get(url, headers=headers)
-        debug_print(f"Response status code: {response.status_code}", debug)
+        The body is written to ``<output>.part`` and renamed once complete.
+        If a partial file and the ETag it was fetched under are left over
+        from an interrupted run, only the missing bytes are requested with
+        a Range/If-Range request. Returns (bytes received, seconds elapsed).
+        """
+        client = get_client()
+        part_path = f"{output}.part"
+        etag_path = f"{part_path}.etag"
+        offset = 0
+        headers = {}
+        if os.path.exists(part_path) and os.path.exists(etag_path):
+            with open(etag_path) as f:
+                etag = f.read().strip()
+            offset = os.path.getsize(part_path)
+            if offset and etag:
+                headers = {"Range": f"bytes={offset}-", "If-Range": etag}
 
-        if response.status_code == 200:
-            print(response.text)
-        else:
-            print(f"Error: {response.status_code} - {response.text}")
+        debug_print(f"Sending request to {client.url(path)}", debug)
+        debug_print(f"Resuming from byte {offset}" if headers else "Starting download from scratch", debug)
+        started = time.monotonic()
+        while True:
+            with client.get(path, headers=headers, stream=True) as response:
+                debug_print(f"Response status code: {response.status_code}", debug)
+                if headers and response.status_code not in (200, 206, 416):
+                    # The server would not resume this partial copy: discard it
+                    # and fetch the whole state instead
+                    debug_print("Resume rejected, restarting download from scratch", debug)
+                    for stale in (part_path, etag_path):
+                        if os.path.exists(stale):
+                            os.remove(stale)
+                    headers = {}
+                    continue
+                if response.status_code == 416:
+                    # Nothing left to fetch: the partial file is already complete
+                    received = 0
+                elif response.status_code in (200, 206):
+                    mode = "ab" if response.status_code == 206 else "wb"
+                    etag = response.headers.get("ETag")
+                    if etag:
+                        with open(etag_path, "w") as f:
+                            f.write(etag)
+                    elif os.path.exists(etag_path):
+                        os.remove(etag_path)
+                    with open(part_path, mode) as f:
+                        received, _ = copy_stream(response.iter_content(CHUNK_SIZE), f)
+                else:
+                    response.raise_for_status()
+                    raise RuntimeError(f"Unexpected response status {response.status_code}")
+            break
+        os.replace(part_path, output)
+        if os.path.exists(etag_path):
+            os.remove(etag_path)
+        return received, time.monotonic() - started
 
     @staticmethod
-    def set_state(project, state_path, file_path, debug=False):
-        url = f"{BASE_URL}/api/v1/states/{project}/{state_path}"
-        headers = {
-            "Authorization": get_auth_header()
-        }
-        debug_print(f"Sending request to {url}", debug)
-        debug_print(f"Headers: {headers}", debug)
+    def get_cached_state(project, state_path, debug=False):
+        """Return the local path of an up-to-date cached copy of a state.
 
-        with open(file_path, 'r') as file:
-            state_content = file.read()
+        A cached entry is revalidated with If-None-Match; only a changed or
+        uncached state is downloaded. Raises on HTTP errors.
+        """
+        client = get_client()
+        cache = StateCache()
+        key = f"{project}/{state_path}"
+        path = f"/api/v1/states/{key}"
+        entry = cache.lookup(key)
+        headers = {"If-None-Match": entry["etag"]} if entry and entry["etag"] else {}
 
-        response = requests.post(url, data=state_content, headers=headers)
-        debug_print(f"Response status code: {response.status_code}", debug)
+        debug_print(f"Sending request to {client.url(path)}", debug)
+        with client.get(path, headers=headers, stream=True) as response:
+            debug_print(f"Response status code: {response.status_code}", debug)
+            if response.status_code == 304 and entry:
+                debug_print(f"Serving {key} from cache", debug)
+                cache.touch(key)
+            else:
+                response.raise_for_status()
+                entry = cache.store(key, response.headers.get("ETag"), response.iter_content(CHUNK_SIZE))
+        cache.evict()
+        return cache.body_path(entry)
 
-        if response.status_code == 200:
-            print("State updated successfully")
-        else:
-            print(f"Error: {response.status_code} - {response.text}")
+    @staticmethod
+    def manage_cache(clear=False):
+        cache = StateCache()
+        if clear:
+            cache.clear()
+            print("State cache cleared")
+            return True
+        stats = cache.stats()
+        print(f"Cache directory: {cache.root}")
+        print(f"Cached states: {stats['entries']} ({stats['objects']} unique bodies, {stats['bytes']} bytes)")
+        return True
+
+    @staticmethod
+    def get_state(project, state_path, debug=False, output=None, cache=False):
+        client = get_client()
+        path = f"/api/v1/states/{project}/{state_path}"
+
+        if cache:
+            try:
+                cached_path = StateManager.get_cached_state(project, state_path, debug)
+            except Exception as error:
+                print(f"Error: {error}")
+                return False
+            if output:
+                shutil.copyfile(cached_path, output)
+                print(f"State saved to '{output}'")
+            else:
+                with open(cached_path, "rb") as f:
+                    shutil.copyfileobj(f, sys.stdout.buffer, CHUNK_SIZE)
+                sys.stdout.buffer.flush()
+            return True
+
+        if output:
+            try:
+                received, elapsed = StateManager.download_to_file(path, output, debug)
+            except Exception as error:
+                print(f"Error: {error}")
+                return False
+            print(f"State saved to '{output}': {format_transfer(received, elapsed)}")
+            return True
+
+        debug_print(f"Sending request to {client.url(path)}", debug)
+        try:
+            # Pass raw bytes through rather than decoding the whole state
+            copy_stream(TsmClient(http_client=client).stream_state(project, state_path), sys.stdout.buffer)
+            sys.stdout.buffer.flush()
+        except TsmError as error:
+            print(f"Error: {error}")
+            return False
+        return True
+
+    @staticmethod
+    def fetch_state_document(key, debug=False):
+        """Fetch a state by key and return it parsed."""
+        debug_print(f"Fetching {key}", debug)
+        return json.loads(TsmClient().get_state_by_key(key))
+
+    @staticmethod
+    def diff_state(project, state_path, against=1, output_format="text", debug=False):
+        key = f"{project}/{state_path}"
+        backup_key = f"{key}.{against}"
+        documents = {}
+        fetch = functools.partial(StateManager.fetch_state_document, debug=debug)
+        for fetched_key, document, error in run_concurrently(fetch, [backup_key, key], workers=2):
+            if error:
+                print(f"Error fetching {fetched_key}: {error}")
+                return False
+            documents[fetched_key] = document
+        old, new = documents[backup_key], documents[key]
+        diff = diff_states(old, new)
+
+        if output_format == "json":
+            diff.update(old={"key": backup_key, "serial": old.get("serial"), "lineage": old.get("lineage")},
+                        new={"key": key, "serial": new.get("serial"), "lineage": new.get("lineage")})
+            print(json.dumps(diff, indent=2))
+            return True
+
+        print(f"Comparing {backup_key} (serial {old.get('serial')}) with {key} (serial {new.get('serial')})")
+        if old.get("lineage") != new.get("lineage"):
+            print(f"Warning: lineage differs ({old.get('lineage')} -> {new.get('lineage')})")
+        for section in ("resources", "outputs"):
+            changes = diff[section]
+            if not any(changes.values()):
+                continue
+            print(f"{section.capitalize()}:")
+            for address in changes["added"]:
+                print(f"  + {address}")
+            for address in changes["removed"]:
+                print(f"  - {address}")
+            for address, fields in changes["changed"].items():
+                print(f"  ~ {address}" + (f": {', '.join(fields)}" if fields else ""))
+        resources, outputs = diff["resources"], diff["outputs"]
+        print(f"{len(resources['added'])} resources added, {len(resources['removed'])} removed, {len(resources['changed'])} changed; "
+              f"{len(outputs['added'])} outputs added, {len(outputs['removed'])} removed, {len(outputs['changed'])} changed.")
+        return True
+
+    @staticmethod
+    def _fetch_parsed(key):
+        """Download a state into memory and return its ETag, size, SHA-256, raw body and parsed document."""
+        with get_client().get(f"/api/v1/states/{key}", stream=True) as response:
+            if response.status_code == 404:
+                raise NotFoundError(404, f"{key} not found", response.request.path_url)
+            response.raise_for_status()
+            buffer = io.BytesIO()
+            size, sha256 = copy_stream(response.iter_content(CHUNK_SIZE), buffer)
+            etag = response.headers.get("ETag")
+        body = buffer.getvalue()
+        return {"etag": etag, "size": size, "sha256": sha256, "body": body, "document": json.loads(body)}
 
     @staticmethod
-    def delete_state(project, state_path, debug=False):
-        url = f"{BASE_URL}/api/v1/states/{project}/{state_path}"
-        headers = {
-            "Authorization": get_auth_header()
-        }
-        debug_print(f"Sending request to {url}", debug)
-        debug_print(f"Headers: {headers}", debug)
+    def _fetch_index_entry(key):
+        """Download and parse one state, keeping only what the resource index stores.
+
+        The body and parsed document are dropped in the worker, so results
+        waiting to be written hold a few hashes and resource rows per state.
+        """
+        fetched = StateManager._fetch_parsed(key)
+        document = fetched["document"]
+        return {"etag": fetched["etag"], "size": fetched["size"], "sha256": fetched["sha256"],
+                "serial": document.get("serial"), "lineage": document.get("lineage"), "rows": resource_rows(document)}
+
+    @staticmethod
+    def index_states(project=None, workers=DEFAULT_WORKERS, include_backups=False, index_path=DEFAULT_INDEX_PATH, debug=False):
+        try:
+            entries = StateManager.fetch_state_entries(project, include_backups=include_backups, debug=debug)
+        except Exception as error:
+            print(f"Error listing states: {error}")
+            return False
+
+        index = ResourceIndex(index_path)
+        try:
+            known = index.known_states(project)
+            # A listed ETag equal to the indexed one means the content is unchanged
+            to_fetch = [entry["key"] for entry in entries
+                        if not (entry.get("etag") and entry["key"] in known and known[entry["key"]][0] == entry["etag"])]
+            summary = {"indexed": 0, "resources": 0, "unchanged": len(entries) - len(to_fetch), "removed": 0, "failed": 0}
+
+            for key, result, error in run_concurrently(StateManager._fetch_index_entry, to_fetch, workers):
+                if error:
+                    summary["failed"] += 1
+                    print(f"  Failed to index {key}: {error}")
+                elif key in known and known[key][1] == result["sha256"]:
+                    index.update_etag(key, result["etag"])
+                    summary["unchanged"] += 1
+                else:
+                    count = index.store_state(key, result["etag"], result["sha256"], result["size"],
+                                              result["serial"], result["lineage"], result["rows"])
+                    debug_print(f"Indexed {key}: serial {result['serial']}, {count} resources", debug)
+                    summary["indexed"] += 1
+                    summary["resources"] += count
+
+            remote = {entry["key"] for entry in entries}
+            removed = [key for key in known if key not in remote and (include_backups or not StateManager.is_backup_key(key))]
+            index.remove_states(removed)
+            summary["removed"] = len(removed)
+            stats = index.stats()
+        finally:
+            index.close()
+        print(f"Indexed {summary['indexed']} states ({summary['resources']} resources), {summary['unchanged']} unchanged, "
+              f"{summary['removed']} removed, {summary['failed']} failed. "
+              f"Index holds {stats['resources']} resources in {stats['states']} states.")
+        return not summary["failed"]
+
+    @staticmethod
+    def query_index(resource_type=None, address=None, provider=None, project=None, limit=None, output_format="text",
+                    index_path=DEFAULT_INDEX_PATH):
+        if not os.path.exists(index_path):
+            print(f"Error: no resource index at '{index_path}', run 'state index' first")
+            return False
+        index = ResourceIndex(index_path)
+        try:
+            rows = index.query(resource_type, address, provider, project, limit)
+        finally:
+            index.close()
+        if output_format == "ndjson":
+            for row in rows:
+                print(json.dumps(row))
+            return True
+        for row in rows:
+            print(f"{row['project']}/{row['state_path']}  serial {row['serial']}  {row['address']}")
+        print(f"{len(rows)} resources found.")
+        return True
+
+    @staticmethod
+    def _verify_object(entry):
+        """Stream one stored object through MD5 and SHA-256 and check it; returns its report record."""
+        md5 = hashlib.md5()
+
+        def hashed(chunks):
+            for chunk in chunks:
+                md5.update(chunk)
+                yield chunk
+
+        with get_client().get(f"/api/v1/states/{entry['key']}", stream=True) as response:
+            if response.status_code == 404:
+                raise RuntimeError(f"{entry['key']} not found")
+            response.raise_for_status()
+            buffer = io.BytesIO()
+            size, sha256 = copy_stream(hashed(response.iter_content(CHUNK_SIZE)), buffer)
+        return check_object(buffer.getvalue(), size, sha256, md5.hexdigest(), entry)
+
+    @staticmethod
+    def verify_states(project=None, workers=DEFAULT_WORKERS, output_format="text", report_path=None, debug=False):
+        """Check every state and backup slot and print a report; returns it, or None if listing failed.
+
+        Objects are downloaded concurrently and only a small record is kept
+        for each, so memory use depends on the number of workers and the
+        largest state, not on how many states there are.
+        """
+        try:
+            entries = StateManager.fetch_state_entries(project, include_backups=True, debug=debug)
+        except Exception as error:
+            print(f"Error listing states: {error}")
+            return None
 
-        response = requests.delete(url, headers=headers)
-        debug_print(f"Response status code: {response.status_code}", debug)
+        chains = {}
+        for entry, record, error in run_concurrently(StateManager._verify_object, entries, workers):
+            if error:
+                record = {"key": entry["key"], "valid": False, "issues": [f"download failed: {error}"]}
+            debug_print(f"{record['key']}: {'; '.join(record['issues']) or 'ok'}", debug)
+            match = BACKUP_SUFFIX_RE.search(record["key"])
+            state_key = record["key"][:match.start()] if match else record["key"]
+            record["slot"] = int(match.group(1)) if match else 0
+            chains.setdefault(state_key, {})[record["slot"]] = record
 
-        if response.status_code == 200:
-            print("State deleted successfully")
+        states = []
+        for state_key in sorted(chains):
+            slots = chains[state_key]
+            issues = check_chain(slots)
+            states.append({"key": state_key, "ok": not issues and not any(record["issues"] for record in slots.values()),
+                           "issues": issues, "slots": [slots[slot] for slot in sorted(slots)]})
+        report = {"checked": len(entries), "bytes": sum(record.get("size") or 0 for state in states for record in state["slots"]),
+                  "states": len(states), "failed": sum(1 for state in states if not state["ok"]), "results": states}
+
+        if report_path:
+            with open(report_path, "w") as f:
+                json.dump(report, f, indent=2)
+        if output_format == "json":
+            print(json.dumps(report, indent=2))
+            return report
+        for state in states:
+            if state["ok"]:
+                continue
+            print(f"{state['key']}:")
+            for issue in state["issues"]:
+                print(f"  {issue}")
+            for record in state["slots"]:
+                for issue in record["issues"]:
+                    print(f"  {slot_label(record['slot'])}: {issue}")
+        print(f"Verified {report['checked']} objects ({report['bytes'] / (1024 * 1024):.2f} MiB) in {report['states']} states: "
+              f"{report['states'] - report['failed']} ok, {report['failed']} with problems.")
+        return report
+
+    @staticmethod
+    def backup_slots(project, state_path, debug=False):
+        """Return {slot number: listing entry} for a state, slot 0 being the current state."""
+        key = f"{project}/{state_path}"
+        slot_re = re.compile(re.escape(key) + r"(?:\.(\d+))?")
+        slots = {}
+        for entry in StateManager.iter_state_entries(project, prefix=state_path, debug=debug):
+            match = slot_re.fullmatch(entry["key"])
+            if match:
+                slots[int(match.group(1) or 0)] = entry
+        return slots
+
+    @staticmethod
+    def state_history(project, state_path, workers=DEFAULT_WORKERS, output_format="text", debug=False):
+        key = f"{project}/{state_path}"
+        try:
+            slots = StateManager.backup_slots(project, state_path, debug)
+        except Exception as error:
+            print(f"Error listing backups: {error}")
+            return False
+        if not slots:
+            print(f"Error: {key} not found")
+            return False
+
+        keys = [slots[slot]["key"] for slot in sorted(slots)]
+        labels = {slots[slot]["key"]: str(slot) if slot else "current" for slot in slots}
+        uploaded = {entry["key"]: entry.get("uploaded") for entry in slots.values()}
+        versions, errors = {}, {}
+        for fetched_key, result, error in run_concurrently(StateManager._fetch_parsed, keys, workers):
+            if error:
+                errors[fetched_key] = error
+            else:
+                versions[fetched_key] = result
+
+        # Backups that did not change between uploads hold identical bodies, show each version once
+        history = []
+        by_hash = {}
+        for version_key in keys:
+            version = versions.get(version_key)
+            if version is None:
+                continue
+            if version["sha256"] in by_hash:
+                by_hash[version["sha256"]]["slots"].append(labels[version_key])
+                continue
+            document = version["document"]
+            entry = {"slots": [labels[version_key]], "serial": document.get("serial"), "lineage": document.get("lineage"),
+                     "size": version["size"], "uploaded": uploaded.get(version_key), "sha256": version["sha256"]}
+            by_hash[version["sha256"]] = entry
+            history.append(entry)
+
+        if output_format == "json":
+            print(json.dumps({"key": key, "versions": history,
+                              "errors": {labels[k]: str(error) for k, error in errors.items()}}, indent=2))
+            return not errors
+        print(f"{'SLOT':<12} {'SERIAL':>7}  {'LINEAGE':<36}  {'SIZE':>10}  {'UPLOADED':<32}  SHA256")
+        for entry in history:
+            print(f"{','.join(entry['slots']):<12} {entry['serial'] if entry['serial'] is not None else '':>7}  "
+                  f"{entry['lineage'] or '':<36}  {entry['size']:>10}  {entry['uploaded'] or '':<32}  {entry['sha256'][:12]}")
+        for error_key in keys:
+            if error_key in errors:
+                print(f"{labels[error_key]:<12} error: {errors[error_key]}")
+        print(f"{len(history)} distinct versions in {len(versions)} slots.")
+        return not errors
+
+    @staticmethod
+    def rollback_state(project, state_path, to, force=False, debug=False):
+        key = f"{project}/{state_path}"
+        backup_key = f"{key}.{to}"
+        versions = {}
+        for fetched_key, result, error in run_concurrently(StateManager._fetch_parsed, [backup_key, key], workers=2):
+            # Only a missing current state may be rolled back over; any other error leaves nothing to check against
+            if error and (fetched_key == backup_key or not isinstance(error, NotFoundError)):
+                print(f"Error fetching {fetched_key}: {error}")
+                return False
+            versions[fetched_key] = result
+        backup, current = versions[backup_key], versions.get(key)
+
+        if current and current["sha256"] == backup["sha256"]:
+            print(f"{key} already matches backup .{to}, nothing to roll back")
+            return True
+        if not force:
+            lock_info = TsmClient().get_lock(project, state_path)
+            if lock_info:
+                print(f"Error: {key} is locked (ID {lock_info.get('ID')}), use --force to roll back anyway")
+                return False
+            current_lineage = current and current["document"].get("lineage")
+            if current_lineage and current_lineage != backup["document"].get("lineage"):
+                print(f"Error: backup .{to} has lineage {backup['document'].get('lineage')}, "
+                      f"current state has {current_lineage}; use --force to roll back anyway")
+                return False
+
+        # Terraform expects serials to grow within a lineage, so the restored
+        # content is written as the next serial after the state it replaces
+        document = dict(backup["document"])
+        if current:
+            document["serial"] = (current["document"].get("serial") or 0) + 1
+        body = backup["body"] if document == backup["document"] else (json.dumps(document, indent=2) + "\n").encode("utf-8")
+
+        # The Worker rotates the current state into .1 on upload, so the rollback itself can be undone
+        try:
+            TsmClient().put_state(project, state_path, body)
+        except TsmError as error:
+            print(f"Error: {error}")
+            return False
+        print(f"Rolled back {key} to backup .{to} (serial {backup['document'].get('serial')}), "
+              f"written as serial {document.get('serial')}")
+        if current:
+            print(f"The replaced state (serial {current['document'].get('serial')}) is now backup .1")
+        return True
+
+    @staticmethod
+    def watch_states(project=None, interval=10.0, max_interval=300.0, include_backups=False, workers=DEFAULT_WORKERS,
+                     polls=None, debug=False):
+        """Print one JSON line per added, changed or removed state until interrupted."""
+        from .state_watch import StateWatcher
+
+        watcher = StateWatcher(project=project, include_backups=include_backups, workers=workers)
+        try:
+            for event in watcher.watch(interval, max_interval, polls):
+                print(json.dumps(event), flush=True)
+                debug_print(f"{watcher.requests} requests so far, {watcher.not_modified} listing pages unchanged", debug)
+        except KeyboardInterrupt:
+            pass
+        return True
+
+    @staticmethod
+    def remote_etag_matches(key, etag, debug=False):
+        """Check whether the remote state has this ETag, see TsmClient.state_etag_matches."""
+        matches = TsmClient().state_etag_matches(*key.split("/", 1), etag)
+        debug_print(f"Remote ETag {'matches' if matches else 'differs from'} {etag}", debug)
+        return matches
+
+    @staticmethod
+    def upload_state(key, fileobj, compress=False):
+        """Upload a binary file object to a state without reading it into memory; returns the server's message."""
+        return TsmClient().put_state(*key.split("/", 1), fileobj, compress)
+
+    @staticmethod
+    def set_state(project, state_path, file_path, debug=False, compress=False, force=False, wait_lock=None):
+        debug_print(f"Uploading {file_path} to {project}/{state_path}", debug)
+        try:
+            with open(file_path, 'rb') as file:
+                # R2 ETags are the MD5 of the object body, so an unchanged state costs one conditional GET
+                message = TsmClient().put_state(project, state_path, file, compress, skip_unchanged=not force,
+                                                wait_lock=wait_lock, operation="tsm-admin state set")
+        except TsmError as error:
+            print(f"Error: {error}")
+            return False
+        print("State unchanged, skipping upload" if message is None else "State updated successfully")
+        return True
+
+    @staticmethod
+    def delete_state(project, state_path, debug=False, wait_lock=None):
+        debug_print(f"Deleting {project}/{state_path}", debug)
+        try:
+            print(TsmClient().delete_state(project, state_path, wait_lock, "tsm-admin state delete"))
+        except TsmError as error:
+            print(f"Error: {error}")
+            return False
+        return True
+
+    @staticmethod
+    def download_all_states(debug=False, output="terraform_states_backup.zip"):
+        try:
+            received, elapsed = StateManager.download_to_file("/api/v1/backup/states", output, debug)
+        except Exception as error:
+            print(f"Download backup failed: {error}")
+            if os.path.exists(f"{output}.part"):
+                print(f"Run the command again to resume from '{output}.part'.")
+            return False
+        print(f"All states downloaded and saved as '{output}': {format_transfer(received, elapsed)}")
+        return True
+
+    @staticmethod
+    def _download_to_tempfile(key, temp_dir):
+        client = get_client()
+        with client.get(f"/api/v1/states/{key}", stream=True) as response:
+            response.raise_for_status()
+            with tempfile.NamedTemporaryFile(dir=temp_dir, delete=False) as temp_file:
+                size, sha256 = copy_stream(response.iter_content(CHUNK_SIZE), temp_file)
+        return temp_file.name, size, sha256
+
+    @staticmethod
+    def pull_all(project=None, output=None, archive_format="zip", workers=DEFAULT_WORKERS, exclude_backups=False, debug=False):
+        try:
+            keys = StateManager.fetch_state_keys(project, include_backups=not exclude_backups, debug=debug)
+        except Exception as error:
+            print(f"Error listing states: {error}")
+            return False
+        if not keys:
+            print("No states found.")
+            return True
+
+        output = output or f"terraform_states_backup{ARCHIVE_FORMATS[archive_format]}"
+        manifest = {"generated": datetime.now(timezone.utc).isoformat(), "states": [], "failed": []}
+        temp_dir = tempfile.mkdtemp(prefix="tsm-pull-")
+        if archive_format == "zip":
+            archive = zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED)
+            add_member = archive.write
         else:
-            print(f"Error: {response.status_code} - {response.text}")
-
-    @staticmethod
-    def download_all_states(debug=False):
-        url = f"{BASE_URL}/api/v1/backup/states"
-        headers = {
-            "Authorization": get_auth_header()
-        }
-        debug_print(f"Sending request to {url}", debug)
-        debug_print(f"Headers: {headers}", debug)
-        response = requests.get(url, headers=headers)
-        debug_print(f"Response status code: {response.status_code}", debug)
-        if response.status_code == 200:
-            with open("terraform_states_backup.zip", "wb") as f:
-                f.write(response.content)
-            print("All states downloaded and saved as 'terraform_states_backup.zip'.")
+            archive = tarfile.open(output, "w:gz" if archive_format == "tar.gz" else "w")
+            add_member = archive.add
+
+        try:
+            # Workers stream bodies to temp files; only this thread touches the archive.
+            download = functools.partial(StateManager._download_to_tempfile, temp_dir=temp_dir)
+            for key, result, error in run_concurrently(download, keys, workers):
+                if error:
+                    debug_print(f"Failed to download {key}: {error}", debug)
+                    manifest["failed"].append({"key": key, "error": str(error)})
+                    continue
+                temp_path, size, sha256 = result
+                try:
+                    add_member(temp_path, key)
+                finally:
+                    os.remove(temp_path)
+                manifest["states"].append({"key": key, "size": size, "sha256": sha256})
+
+            manifest["states"].sort(key=lambda entry: entry["key"])
+            manifest_bytes = json.dumps(manifest, indent=2).encode("utf-8")
+            if archive_format == "zip":
+                archive.writestr("manifest.json", manifest_bytes)
+            else:
+                info = tarfile.TarInfo("manifest.json")
+                info.size = len(manifest_bytes)
+                archive.addfile(info, io.BytesIO(manifest_bytes))
+        finally:
+            archive.close()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        with open(f"{output}.manifest.json", "wb") as f:
+            f.write(manifest_bytes)
+        total = sum(entry["size"] for entry in manifest["states"])
+        print(f"Pulled {len(manifest['states'])} of {len(keys)} states ({total} bytes) into '{output}'.")
+        if manifest["failed"]:
+            print(f"Failed to pull {len(manifest['failed'])} states:")
+            for entry in manifest["failed"]:
+                print(f"  {entry['key']}: {entry['error']}")
+        return not manifest["failed"]
+
+    @staticmethod
+    def _mirror_path(directory, key):
+        path = os.path.abspath(os.path.join(directory, key))
+        if os.path.commonpath([os.path.abspath(directory), path]) != os.path.abspath(directory):
+            raise ValueError(f"State key '{key}' escapes the mirror directory")
+        return path
+
+    @staticmethod
+    def _sync_one(key, directory, known_etag):
+        """Fetch one state into the mirror unless the server reports it unchanged."""
+        client = get_client()
+        headers = {"If-None-Match": known_etag} if known_etag else {}
+        with client.get(f"/api/v1/states/{key}", headers=headers, stream=True) as response:
+            if response.status_code == 304:
+                return None
+            response.raise_for_status()
+            local_path = StateManager._mirror_path(directory, key)
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(local_path))
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    size, sha256 = copy_stream(response.iter_content(CHUNK_SIZE), f)
+                os.replace(temp_path, local_path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+            return {"etag": response.headers.get("ETag"), "size": size, "sha256": sha256}
+
+    @staticmethod
+    def sync_states(directory, project=None, workers=DEFAULT_WORKERS, exclude_backups=False, debug=False):
+        os.makedirs(directory, exist_ok=True)
+        manifest_path = os.path.join(directory, SYNC_MANIFEST)
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+
+        try:
+            entries = StateManager.fetch_state_entries(project, include_backups=not exclude_backups, debug=debug)
+        except Exception as error:
+            print(f"Error listing states: {error}")
+            return False
+        remote = {entry["key"]: entry for entry in entries}
+
+        def in_scope(key):
+            if project and not key.startswith(f"{project}/"):
+                return False
+            return not (exclude_backups and StateManager.is_backup_key(key))
+
+        # Keys whose listed ETag matches the manifest need no request at all;
+        # without listed ETags a conditional GET decides. A mirror file that
+        # went missing is fetched unconditionally so it gets restored.
+        known_etags = {}
+        for key, entry in remote.items():
+            known = manifest.get(key)
+            if known and not os.path.exists(StateManager._mirror_path(directory, key)):
+                known = None
+            if known and entry.get("etag") and entry["etag"] == known["etag"]:
+                continue
+            known_etags[key] = (known or {}).get("etag")
+        to_check = list(known_etags)
+
+        summary = {"new": 0, "updated": 0, "unchanged": len(remote) - len(to_check), "deleted": 0, "failed": 0}
+        def fetch(key):
+            return StateManager._sync_one(key, directory, known_etags[key])
+
+        for key, result, error in run_concurrently(fetch, to_check, workers):
+            if error:
+                summary["failed"] += 1
+                print(f"  Failed to sync {key}: {error}")
+            elif result is None:
+                summary["unchanged"] += 1
+            else:
+                summary["updated" if key in manifest else "new"] += 1
+                debug_print(f"Synced {key} ({result['size']} bytes)", debug)
+                manifest[key] = result
+
+        for key in [key for key in manifest if in_scope(key) and key not in remote]:
+            local_path = StateManager._mirror_path(directory, key)
+            if os.path.exists(local_path):
+                os.remove(local_path)
+            # Prune directories emptied by the removal, but never the mirror root
+            parent = os.path.dirname(local_path)
+            while parent != os.path.abspath(directory) and not os.listdir(parent):
+                os.rmdir(parent)
+                parent = os.path.dirname(parent)
+            del manifest[key]
+            summary["deleted"] += 1
+
+        fd, temp_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(temp_path, manifest_path)
+        print(f"Synced {len(remote)} states into '{directory}': "
+              + ", ".join(f"{count} {label}" for label, count in summary.items()))
+        return not summary["failed"]
+
+    @staticmethod
+    def push_all(source, project=None, workers=DEFAULT_WORKERS, include_backups=False, compress=False, report=None, debug=False,
+                 force=False):
+        """Upload every state under a directory or in a backup zip.
+
+        States the server already holds byte for byte are skipped unless
+        force is set: each upload rotates the state's backups, so re-running
+        a partly failed restore would otherwise push real history out.
+        """
+        archive = None
+        if os.path.isdir(source):
+            members = {}
+            for root, _, files in os.walk(source):
+                for name in files:
+                    full_path = os.path.join(root, name)
+                    members[os.path.relpath(full_path, source).replace(os.sep, "/")] = full_path
+
+            def open_member(key):
+                return open(members[key], "rb")
+        elif zipfile.is_zipfile(source):
+            # Members are streamed straight from the archive, never extracted
+            archive = zipfile.ZipFile(source)
+            members = {info.filename: info for info in archive.infolist() if not info.is_dir()}
+
+            def open_member(key):
+                return archive.open(members[key])
         else:
-            print(f"Download backup response: {response.status_code} - {response.text}")
+            print(f"Error: '{source}' is neither a directory nor a zip file")
+            return False
+
+        # Keys need a project prefix; this also skips manifest files at the top level
+        keys = sorted(key for key in members
+                      if "/" in key
+                      and not (project and not key.startswith(f"{project}/"))
+                      and not (not include_backups and StateManager.is_backup_key(key)))
+        if not keys:
+            print("No states found to push.")
+            return True
+
+        def push(key):
+            if not force:
+                md5 = hashlib.md5()
+                with open_member(key) as member:
+                    for chunk in iter(lambda: member.read(CHUNK_SIZE), b""):
+                        md5.update(chunk)
+                if StateManager.remote_etag_matches(key, f'"{md5.hexdigest()}"', debug):
+                    return "unchanged"
+            with open_member(key) as member:
+                StateManager.upload_state(key, member, compress)
+            return "ok"
+
+        results = {}
+        try:
+            for key, status, error in run_concurrently(push, keys, workers):
+                results[key] = {"status": "failed", "error": str(error)} if error else {"status": status}
+                debug_print(f"Pushed {key}: {results[key]['status']}", debug)
+        finally:
+            if archive:
+                archive.close()
+
+        failed = [key for key in keys if results[key]["status"] == "failed"]
+        print("Push results:")
+        for key in keys:
+            line = f"  {results[key]['status'].upper():9} {key}"
+            if key in failed:
+                line += f": {results[key]['error']}"
+            print(line)
+        unchanged = sum(1 for result in results.values() if result["status"] == "unchanged")
+        print(f"Pushed {len(keys) - len(failed) - unchanged} of {len(keys)} states, {unchanged} unchanged, {len(failed)} failed.")
+        if report:
+            with open(report, "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+        return not failed
@@ -0,0 +1,83 @@
+"""Integrity checks for stored Terraform states and their rotated backups.
+
+Every object is checked on its own (size and ETag against the listing, JSON
+and Terraform state structure), then the slots of each state are compared
+with each other. Rotation moves the current state to ``.1``, ``.1`` to ``.2``
+and so on, so within one lineage serials must not increase with the slot
+number, and one serial must not name two different bodies.
+"""
+import json
+import re
+
+SUPPORTED_VERSIONS = (3, 4)
+
+# Single-part R2 uploads use the MD5 of the body as ETag, multipart ones end in "-<parts>"
+MD5_ETAG_RE = re.compile(r'^(?:W/)?"?([0-9a-f]{32})"?$')
+
+def slot_label(slot):
+    return "current" if slot == 0 else f".{slot}"
+
+def check_document(document):
+    """Return the problems that keep a parsed document from being a usable Terraform state."""
+    if not isinstance(document, dict):
+        return [f"not a state object but a JSON {type(document).__name__}"]
+    issues = []
+    version = document.get("version")
+    if version not in SUPPORTED_VERSIONS:
+        issues.append(f"unsupported state version {version!r}")
+    serial = document.get("serial")
+    if not isinstance(serial, int) or isinstance(serial, bool) or serial < 0:
+        issues.append(f"invalid serial {serial!r}")
+    if not isinstance(document.get("lineage"), str) or not document["lineage"]:
+        issues.append("missing lineage")
+    if version == 4 and not isinstance(document.get("resources", []), list):
+        issues.append("resources is not a list")
+    if version == 3 and not isinstance(document.get("modules", []), list):
+        issues.append("modules is not a list")
+    return issues
+
+def check_object(body, size, sha256, md5, entry):
+    """Check one downloaded object against its listing entry and return its report record.
+
+    The record holds the checksums, version, serial and lineage and a list
+    of issues; the body itself is not kept.
+    """
+    record = {"key": entry["key"], "size": size, "sha256": sha256, "md5": md5, "etag": entry.get("etag"),
+              "version": None, "serial": None, "lineage": None, "valid": False, "issues": []}
+    if entry.get("size") is not None and entry["size"] != size:
+        record["issues"].append(f"listed size {entry['size']} but downloaded {size} bytes")
+    match = MD5_ETAG_RE.match(entry.get("etag") or "")
+    if match and match.group(1) != md5:
+        record["issues"].append(f"ETag {entry['etag']} does not match body MD5 {md5}")
+    try:
+        document = json.loads(body)
+    except ValueError as error:
+        record["issues"].append(f"invalid JSON: {error}")
+        return record
+    issues = check_document(document)
+    record["issues"].extend(issues)
+    if isinstance(document, dict):
+        record.update(version=document.get("version"), serial=document.get("serial"), lineage=document.get("lineage"))
+    # Chain checks only trust slots that are valid states themselves
+    record["valid"] = not issues
+    return record
+
+def check_chain(slots):
+    """Compare the slots ({slot number: record}) of one state and return the problems found."""
+    issues = []
+    if 0 not in slots:
+        issues.append("backups exist but the current state is missing")
+    missing = [slot for slot in range(1, max(slots) + 1) if slot not in slots]
+    if missing:
+        issues.append("missing backup slots " + ", ".join(slot_label(slot) for slot in missing))
+
+    valid = [(slot, slots[slot]) for slot in sorted(slots) if slots[slot].get("valid")]
+    for (newer_slot, newer), (older_slot, older) in zip(valid, valid[1:]):
+        newer_label, older_label = slot_label(newer_slot), slot_label(older_slot)
+        if newer["lineage"] != older["lineage"]:
+            issues.append(f"lineage changes from {older['lineage']} in {older_label} to {newer['lineage']} in {newer_label}")
+        elif newer["serial"] < older["serial"]:
+            issues.append(f"serial goes backwards: {older_label} has {older['serial']}, newer {newer_label} has {newer['serial']}")
+        elif newer["serial"] == older["serial"] and newer["sha256"] != older["sha256"]:
+            issues.append(f"serial {newer['serial']} names different contents in {older_label} and {newer_label}")
+    return issues
@@ -0,0 +1,126 @@
+"""Change feed over stored states built on conditional listing requests.
+
+Every poll re-lists the states with the ETag of each listing page as
+If-None-Match, so an unchanged page costs one small 304 response. Only states
+whose ETag changed are downloaded, to report their content hash and serial.
+"""
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+from .api import TsmClient, filter_state_entries, state_prefix
+from .utils import run_concurrently, DEFAULT_WORKERS
+
+class StateWatcher:
+    """Detects added, changed and removed states between polls.
+
+    The first poll only records the current states; later polls return one
+    event dict per change with the key, old and new ETag, the new sha256,
+    serial and lineage, and the previous sha256 and serial when they are known.
+    """
+
+    def __init__(self, client=None, project=None, include_backups=False, page_size=1000, workers=DEFAULT_WORKERS):
+        self.client = client or TsmClient()
+        self.prefix = state_prefix(project)
+        self.include_backups = include_backups
+        self.page_size = page_size
+        self.workers = workers
+        # (cursor, page ETag, entries, next cursor) for every listing page of the last poll
+        self.pages = []
+        self.states = None
+        self.requests = 0
+        self.not_modified = 0
+
+    def list_states(self):
+        """List all states, reusing cached pages that the server reports as unchanged."""
+        pages = []
+        cursor = None
+        while True:
+            cached = self.pages[len(pages)] if len(pages) < len(self.pages) else None
+            if cached and cached[0] != cursor:
+                cached = None
+            result = self.client.list_state_page(self.prefix, cursor, self.page_size, cached and cached[1])
+            self.requests += 1
+            if result is None:
+                self.not_modified += 1
+                _, etag, entries, next_cursor = cached
+            else:
+                entries, next_cursor, etag = result
+            pages.append((cursor, etag, entries, next_cursor))
+            if not next_cursor:
+                break
+            cursor = next_cursor
+        self.pages = pages
+        return {entry["key"]: entry for _, _, entries, _ in pages
+                for entry in filter_state_entries(entries, self.prefix, self.include_backups)}
+
+    def describe(self, key):
+        """Download a state and return its sha256, serial and lineage."""
+        body = self.client.get_state_by_key(key)
+        try:
+            document = json.loads(body)
+        except ValueError:
+            document = {}
+        if not isinstance(document, dict):
+            document = {}
+        return {"sha256": hashlib.sha256(body).hexdigest(), "serial": document.get("serial"),
+                "lineage": document.get("lineage")}
+
+    def poll(self):
+        """List the states once and return the change events since the previous poll."""
+        listing = self.list_states()
+        if self.states is None:
+            self.states = {key: {"etag": entry.get("etag")} for key, entry in listing.items()}
+            return []
+
+        now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        changed = [key for key, entry in sorted(listing.items())
+                   if key not in self.states or entry.get("etag") != self.states[key].get("etag")]
+        self.requests += len(changed)
+        events = []
+        for key, details, error in run_concurrently(self.describe, changed, self.workers):
+            old = self.states.get(key, {})
+            event = {"time": now, "event": "changed" if old else "added", "key": key,
+                     "old_etag": old.get("etag"), "etag": listing[key].get("etag"),
+                     "old_sha256": old.get("sha256"), "sha256": None,
+                     "old_serial": old.get("serial"), "serial": None, "lineage": None,
+                     "size": listing[key].get("size")}
+            if error:
+                # Keep the old ETag so the state is examined again on the next poll
+                event.update(event="error", error=str(error))
+            else:
+                event.update(details)
+                self.states[key] = dict(details, etag=listing[key].get("etag"))
+            events.append(event)
+
+        for key in sorted(set(self.states) - set(listing)):
+            old = self.states.pop(key)
+            events.append({"time": now, "event": "removed", "key": key, "old_etag": old.get("etag"), "etag": None,
+                           "old_sha256": old.get("sha256"), "sha256": None,
+                           "old_serial": old.get("serial"), "serial": None, "lineage": None, "size": None})
+        return sorted(events, key=lambda event: event["key"])
+
+    def watch(self, interval=10.0, max_interval=300.0, polls=None):
+        """Poll forever (or polls times), yielding events as they are found.
+
+        The delay between polls doubles up to max_interval while nothing
+        changes and drops back to interval after any change.
+        """
+        delay = interval
+        count = 0
+        while True:
+            try:
+                events = self.poll()
+            except Exception as error:
+                # The HTTP client already retried; report and keep watching
+                events = []
+                yield {"time": datetime.now(timezone.utc).isoformat(timespec="seconds"), "event": "error",
+                       "key": None, "error": str(error)}
+            yield from events
+            count += 1
+            if polls is not None and count >= polls:
+                return
+            if events:
+                delay = interval
+            time.sleep(delay)
+            delay = min(delay * 2, max_interval)
@@ -0,0 +1,97 @@
+import json
+import re
+import sys
+import threading
+
+ROUTE_TEMPLATES = [
+    (re.compile(r"^/api/v1/states/[^/]+/.+$"), "/api/v1/states/:projectName/*"),
+    (re.compile(r"^/api/v1/lock/[^/]+/.+$"), "/api/v1/lock/:projectName/*"),
+    (re.compile(r"^/api/v1/users/[^/]+$"), "/api/v1/users/:username"),
+]
+
+# Connection setup happens on the thread issuing the request, so timings
+# collected while opening a connection are attributed through a thread-local.
+_phase_timings = threading.local()
+
+def route_template(path):
+    """Map a request path to the Worker route it hits, e.g. /api/v1/states/:projectName/*."""
+    path = path.split("?", 1)[0]
+    for pattern, template in ROUTE_TEMPLATES:
+        if pattern.match(path):
+            return template
+    return path
+
+def phase_timings():
+    """Connection phase timings (seconds by phase) collected on this thread since the last pop."""
+    if not hasattr(_phase_timings, "values"):
+        _phase_timings.values = {}
+    return _phase_timings.values
+
+def pop_phase_timings():
+    values = phase_timings()
+    _phase_timings.values = {}
+    return values
+
+def add_phase_timing(name, seconds):
+    values = phase_timings()
+    values[name] = values.get(name, 0.0) + seconds
+
+class RequestTracer:
+    """Collects one record per HTTP call and optionally appends it to a JSON-lines file.
+
+    Records carry method, route template, status, bytes sent/received,
+    DNS/connect/TLS/TTFB/total times in milliseconds and the retry count.
+    Request headers are never recorded, so traces contain no credentials.
+    """
+
+    def __init__(self, trace_file=None):
+        self.records = []
+        self._lock = threading.Lock()
+        self._trace = open(trace_file, "a") if trace_file else None
+
+    def record(self, entry):
+        entry = {key: round(value, 3) if key.endswith("_ms") and value is not None else value for key, value in entry.items()}
+        with self._lock:
+            self.records.append(entry)
+            if self._trace:
+                self._trace.write(json.dumps(entry) + "\n")
+                self._trace.flush()
+
+    def close(self):
+        if self._trace:
+            self._trace.close()
+            self._trace = None
+
+    def summary_rows(self):
+        """Aggregate records per method and route: connection setup and TTFB averages, total latency percentiles."""
+        groups = {}
+        with self._lock:
+            for entry in self.records:
+                groups.setdefault((entry["method"], entry["route"]), []).append(entry)
+        rows = []
+        for (method, route), entries in sorted(groups.items()):
+            totals = sorted(entry["total_ms"] for entry in entries)
+            ttfbs = [entry["ttfb_ms"] for entry in entries if entry["ttfb_ms"] is not None]
+            rows.append({
+                "method": method,
+                "route": route,
+                "count": len(entries),
+                "errors": sum(1 for entry in entries if entry["status"] is None or entry["status"] >= 500),
+                "retries": sum(1 for entry in entries if entry["retries"]),
+                "setup_ms": sum(entry["dns_ms"] + entry["connect_ms"] + entry["tls_ms"] for entry in entries) / len(entries),
+                "ttfb_ms": sum(ttfbs) / len(ttfbs) if ttfbs else 0.0,
+                "p50_ms": totals[len(totals) // 2],
+                "p95_ms": totals[min(len(totals) - 1, int(len(totals) * 0.95))],
+                "bytes_sent": sum(entry["bytes_sent"] for entry in entries),
+                "bytes_received": sum(entry["bytes_received"] for entry in entries),
+            })
+        return rows
+
+    def print_summary(self, out=None):
+        out = out or sys.stderr
+        print(f"{'METHOD':<7} {'ROUTE':<32} {'COUNT':>6} {'ERR':>4} {'RETRY':>5} {'SETUP ms':>9} {'TTFB ms':>9} "
+              f"{'P50 ms':>9} {'P95 ms':>9} {'SENT':>10} {'RECEIVED':>10}", file=out)
+        for row in self.summary_rows():
+            print(f"{row['method']:<7} {row['route']:<32} {row['count']:>6} {row['errors']:>4} {row['retries']:>5} "
+                  f"{row['setup_ms']:>9.1f} {row['ttfb_ms']:>9.1f} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} "
+                  f"{row['bytes_sent']:>10} {row['bytes_received']:>10}", file=out)
@@ -1,8 +1,17 @@
-import requests
+import csv
 import getpass
+import io
 import json
 import os
-from .utils import BASE_URL, get_auth_header, debug_print
+import secrets
+import tempfile
+import zipfile
+from .api import TsmClient
+from .exceptions import ApiError, AuthenticationError
+from .http_client import get_client
+from .utils import debug_print, run_concurrently, RateLimiter, copy_stream, CHUNK_SIZE, DEFAULT_WORKERS
+
+USER_FIELDS = ["username", "project", "role", "password"]
 
 class UserManager:
     @staticmethod
@@ -22,76 +31,182 @@ class UserManager:
 
         subparsers.add_parser("list", help="List all users")
 
+        import_parser = subparsers.add_parser("import", help="Create users in bulk from a CSV or JSON file")
+        import_parser.add_argument("file", help="CSV or JSON file with username, project, role and optional password columns")
+        import_parser.add_argument("--format", choices=["csv", "json"], help="File format (default: from the file extension)")
+        import_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of concurrent requests")
+        import_parser.add_argument("--rate", type=float, help="Maximum requests per second")
+        import_parser.add_argument("--results", help="Result file (default: <file>.results.<format>); includes generated passwords")
+
+        export_parser = subparsers.add_parser("export", help="Export users to a CSV or JSON file")
+        export_parser.add_argument("file", help="Output file")
+        export_parser.add_argument("--format", choices=["csv", "json"], help="File format (default: from the file extension)")
+        export_parser.add_argument("--from-backup", action="store_true", help="Read users from the backup endpoint instead of the users list")
+
     @staticmethod
     def handle_action(args):
         if args.user_action == "add":
-            UserManager.add_user(args.username, args.project, args.role)
+            return UserManager.add_user(args.username, args.project, args.role, getattr(args, "password", None))
         elif args.user_action == "update":
-            UserManager.update_user(args.username, args.project, args.role)
+            return UserManager.update_user(args.username, args.project, args.role, getattr(args, "password", None))
         elif args.user_action == "delete":
-            UserManager.delete_user(args.username)
+            return UserManager.delete_user(args.username)
         elif args.user_action == "list":
-            UserManager.list_users(args.debug)
+            return UserManager.list_users(args.debug)
+        elif args.user_action == "import":
+            return UserManager.import_users(args.file, args.format, args.workers, args.rate, args.results, args.debug)
+        elif args.user_action == "export":
+            return UserManager.export_users(args.file, args.format, args.from_backup, args.debug)
 
     @staticmethod
-    def add_user(username, project, role):
-        password = getpass.getpass("Enter password: ")
-        url = f"{BASE_URL}/api/v1/users"
-        headers = {
-            "Authorization": get_auth_header(),
-            "Content-Type": "application/json"
-        }
-        data = {
-            "username": username,
-            "password": password,
-            "project": project,
-            "role": role
-        }
-        response = requests.post(url, headers=headers, json=data)
-        print(f"Add user response: {response.status_code} - {response.text}")
+    def add_user(username, project, role, password=None):
+        if password is None:
+            password = getpass.getpass("Enter password: ")
+        try:
+            print(f"Add user response: {TsmClient().create_user(username, password, project, role)}")
+        except ApiError as error:
+            print(f"Add user response: {error}")
+            return False
+        return True
 
     @staticmethod
-    def update_user(username, project, role):
-        password = getpass.getpass("Enter new password (leave blank to keep current): ") or None
-        url = f"{BASE_URL}/api/v1/users/{username}"
-        headers = {
-            "Authorization": get_auth_header(),
-            "Content-Type": "application/json"
-        }
-        data = {}
-        if password:
-            data["password"] = password
-        if project:
-            data["project"] = project
-        if role:
-            data["role"] = role
-        response = requests.put(url, headers=headers, json=data)
-        print(f"Update user response: {response.status_code} - {response.text}")
+    def update_user(username, project, role, password=None):
+        if password is None:
+            password = getpass.getpass("Enter new password (leave blank to keep current): ")
+        try:
+            print(f"Update user response: {TsmClient().update_user(username, password or None, project, role)}")
+        except ApiError as error:
+            print(f"Update user response: {error}")
+            return False
+        return True
 
     @staticmethod
     def delete_user(username):
-        url = f"{BASE_URL}/api/v1/users/{username}"
-        headers = {
-            "Authorization": get_auth_header()
-        }
-        response = requests.delete(url, headers=headers)
-        print(f"Delete user response: {response.status_code} - {response.text}")
+        try:
+            print(f"Delete user response: {TsmClient().delete_user(username)}")
+        except ApiError as error:
+            print(f"Delete user response: {error}")
+            return False
+        return True
 
     @staticmethod
     def list_users(debug=False):
-        url = f"{BASE_URL}/api/v1/users"
-        headers = {
-            "Authorization": get_auth_header()
-        }
-        debug_print(f"URL used: {url}", debug)
-        debug_print(f"Headers used: {headers}", debug)
-        response = requests.get(url, headers=headers)
-        debug_print(f"Response status code: {response.status_code}", debug)
-        debug_print(f"Response content: {response.text}", debug)
-        if response.status_code == 200:
-            users = response.json()
-            print(json.dumps(users, indent=2))
-        elif response.status_code == 401:
+        client = get_client()
+        debug_print(f"URL used: {client.url('/api/v1/users')}", debug)
+        try:
+            users = TsmClient(http_client=client).list_users()
+        except AuthenticationError as error:
+            debug_print(f"Response: {error}", debug)
             print("Error: Unauthorized. Please check your authentication token.")
-        else:
-            print(f"List users response: {response.status_code} - {response.text}")
+            return False
+        except ApiError as error:
+            print(f"List users response: {error}")
+            return False
+        print(json.dumps(users, indent=2))
+        return True
+
+    @staticmethod
+    def _file_format(file_path, file_format=None):
+        return file_format or ("json" if file_path.lower().endswith(".json") else "csv")
+
+    @staticmethod
+    def _read_users_file(file_path, file_format):
+        with open(file_path, newline="") as f:
+            if file_format == "json":
+                rows = json.load(f)
+                if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                    raise ValueError("expected a JSON list of user objects")
+                return rows
+            return list(csv.DictReader(f))
+
+    @staticmethod
+    def _write_users_file(file_path, file_format, rows, fields):
+        # Result files may contain passwords, keep them private
+        fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", newline="") as f:
+            if file_format == "json":
+                json.dump([{field: row.get(field, "") for field in fields} for row in rows], f, indent=2)
+            else:
+                writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(rows)
+
+    @staticmethod
+    def import_users(file_path, file_format=None, workers=DEFAULT_WORKERS, rate=None, results_path=None, debug=False):
+        file_format = UserManager._file_format(file_path, file_format)
+        try:
+            rows = UserManager._read_users_file(file_path, file_format)
+        except (OSError, ValueError, csv.Error) as error:
+            print(f"Import users failed: {error}")
+            return False
+        tsm = TsmClient()
+        limiter = RateLimiter(rate)
+
+        def provision(index):
+            row = rows[index]
+            password = row.get("password") or secrets.token_urlsafe(16)
+            limiter.wait()
+            try:
+                message = tsm.create_user(row["username"], password, row["project"], row["role"])
+            except ApiError as error:
+                return False, str(error), password, False
+            return True, message, password, not row.get("password")
+
+        results = [None] * len(rows)
+        for index, outcome, error in run_concurrently(provision, range(len(rows)), workers):
+            row = rows[index]
+            result = {"username": row.get("username", ""), "project": row.get("project", ""), "role": row.get("role", "")}
+            if error:
+                result.update(status="failed", detail=str(error))
+            else:
+                created, detail, password, generated = outcome
+                result.update(status="created" if created else "failed", detail=detail)
+                if generated:
+                    result["password"] = password
+            debug_print(f"{result['username']}: {result['detail']}", debug)
+            results[index] = result
+
+        results_path = results_path or f"{file_path}.results.{file_format}"
+        UserManager._write_users_file(results_path, file_format, results, ["username", "project", "role", "status", "detail", "password"])
+        created = sum(1 for result in results if result["status"] == "created")
+        print(f"Imported {created} of {len(rows)} users, {len(rows) - created} failed. Results written to '{results_path}'.")
+        return created == len(rows)
+
+    @staticmethod
+    def _fetch_users_list(debug=False):
+        client = get_client()
+        path = "/api/v1/users"
+        debug_print(f"URL used: {client.url(path)}", debug)
+        with client.get(path, stream=True) as response:
+            debug_print(f"Response status code: {response.status_code}", debug)
+            response.raise_for_status()
+            with tempfile.TemporaryFile() as temp_file:
+                copy_stream(response.iter_content(CHUNK_SIZE), temp_file)
+                temp_file.seek(0)
+                return json.load(io.TextIOWrapper(temp_file, encoding="utf-8"))
+
+    @staticmethod
+    def _fetch_backup_users(debug=False):
+        client = get_client()
+        path = "/api/v1/backup/users"
+        debug_print(f"URL used: {client.url(path)}", debug)
+        with client.get(path, stream=True) as response:
+            debug_print(f"Response status code: {response.status_code}", debug)
+            response.raise_for_status()
+            with tempfile.TemporaryFile() as temp_file:
+                copy_stream(response.iter_content(CHUNK_SIZE), temp_file)
+                with zipfile.ZipFile(temp_file) as archive, archive.open("users_backup.json") as member:
+                    return json.load(io.TextIOWrapper(member, encoding="utf-8"))
+
+    @staticmethod
+    def export_users(file_path, file_format=None, from_backup=False, debug=False):
+        file_format = UserManager._file_format(file_path, file_format)
+        try:
+            # Both sources are spooled to disk as they arrive rather than buffered in the response
+            users = UserManager._fetch_backup_users(debug) if from_backup else UserManager._fetch_users_list(debug)
+        except Exception as error:
+            print(f"Export users failed: {error}")
+            return False
+        UserManager._write_users_file(file_path, file_format, users, USER_FIELDS)
+        print(f"Exported {len(users)} users to '{file_path}'.")
+        return True
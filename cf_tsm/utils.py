@@ -1,5 +1,11 @@
 import os
 import base64
+import hashlib
+import re
+import threading
+import time
+import zlib
+from datetime import datetime
 from typing import Optional
 
 BASE_URL = os.environ.get("TSM_BASE_URL", "http://localhost:8787")
@@ -23,3 +29,115 @@ def get_auth_header() -> Optional[str]:
     else:
         print("Debug: Neither TSM_AUTH_TOKEN nor TSM_USERNAME and TSM_PASSWORD are set.")
         return None
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_WORKERS = int(os.environ.get("TSM_WORKERS", "8"))
+
+def run_concurrently(func, items, workers=DEFAULT_WORKERS):
+    """Run func over items on a bounded thread pool.
+
+    Yields (item, result, error) tuples in completion order; exactly one of
+    result and error is meaningful for each item. Items are submitted as
+    slots free up, at most two per worker ahead, and each future is dropped
+    once its outcome is yielded, so long item lists do not pile up results.
+    """
+    # concurrent.futures pulls in logging, keep it off the CLI startup path
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    workers = max(1, workers)
+    items = iter(items)
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit_more():
+            for item in items:
+                pending[executor.submit(func, item)] = item
+                if len(pending) >= 2 * workers:
+                    break
+
+        submit_more()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            while done:
+                future = done.pop()
+                item = pending.pop(future)
+                try:
+                    outcome = (item, future.result(), None)
+                except Exception as error:
+                    outcome = (item, None, error)
+                del future
+                submit_more()
+                yield outcome
+
+def copy_stream(chunks, out):
+    """Write an iterable of byte chunks to out, returning (size, sha256 hex digest)."""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in chunks:
+        if chunk:
+            out.write(chunk)
+            digest.update(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
+
+def format_transfer(size, seconds):
+    """Describe a transfer as '<size> in <time> (<rate>)' for progress output."""
+    mib = size / (1024 * 1024)
+    rate = mib / seconds if seconds > 0 else 0.0
+    return f"{mib:.2f} MiB in {seconds:.2f}s ({rate:.2f} MiB/s)"
+
+def file_digest(file_path, algorithm="sha256"):
+    """Hash a file in fixed-size chunks and return the hex digest."""
+    digest = hashlib.new(algorithm)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def gzip_chunks(fileobj):
+    """Yield the gzip-compressed contents of a binary file object chunk by chunk."""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b""):
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+class RateLimiter:
+    """Spaces calls made from any number of threads at least 1/rate seconds apart."""
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+def parse_duration(value):
+    """Parse durations such as '90', '90s', '30m', '2h' or '1d' into seconds."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*", value)
+    if not match:
+        raise ValueError(f"Invalid duration: {value!r}")
+    return float(match.group(1)) * DURATION_UNITS[match.group(2) or "s"]
+
+DEFAULT_LOCK_WAIT = parse_duration(os.environ.get("TSM_LOCK_WAIT", "5m"))
+
+def parse_timestamp(value):
+    """Parse an RFC 3339 timestamp as written by Terraform, which may carry nanoseconds."""
+    value = value.strip().replace("Z", "+00:00")
+    match = re.fullmatch(r"(\d{4}-\d\d-\d\d[T ]\d\d:\d\d:\d\d)(?:\.(\d+))?([+-]\d\d:\d\d)?", value)
+    if not match:
+        raise ValueError(f"Invalid timestamp: {value!r}")
+    base, fraction, offset = match.groups()
+    # strptime's %z only takes "+HHMM" before Python 3.7, and fromisoformat is 3.7+ too
+    text = base.replace(" ", "T") + f".{(fraction or '')[:6].ljust(6, '0')}" + (offset or "+00:00").replace(":", "")
+    return datetime.strptime(text, "%Y-%m-%dT%H:%M:%S.%f%z")
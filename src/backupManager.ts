@@ -1,32 +1,47 @@
 import { Env } from './types';
 import JSZip from 'jszip';
 import { createUsersBackup } from './userManager';
+import { objectsEtag } from './utils';
 
 // Function to create a zip file containing all Terraform state files
-export async function createStatesBackup(env: Env): Promise<Response> {
+export async function createStatesBackup(env: Env, requestHeaders?: Headers): Promise<Response> {
   const zip = new JSZip();
 
   // List all objects in the bucket
   const objects = await env.BUCKET.list();
 
-  // Add each state file to the zip
+  // Add each state file to the zip, dated by upload time so that the same
+  // bucket contents always produce the same archive bytes
   for (const object of objects.objects) {
     const state = await env.BUCKET.get(object.key);
     if (state) {
-      zip.file(object.key, await state.arrayBuffer());
+      zip.file(object.key, await state.arrayBuffer(), { date: new Date(object.uploaded) });
     }
   }
 
   // Generate the zip file
   const zipBuffer = await zip.generateAsync({ type: "arraybuffer" });
-
-  return new Response(zipBuffer, {
-    status: 200,
-    headers: {
-      'Content-Type': 'application/zip',
-      'Content-Disposition': 'attachment; filename="terraform_states_backup.zip"'
+  const etag = await objectsEtag(objects.objects);
+  const headers: Record<string, string> = {
+    'Content-Type': 'application/zip',
+    'Content-Disposition': 'attachment; filename="terraform_states_backup.zip"',
+    'Accept-Ranges': 'bytes',
+    'ETag': etag
+  };
+
+  // Resume support: serve "bytes=N-" ranges when the client's partial copy matches
+  const range = /^bytes=(\d+)-$/.exec(requestHeaders?.get('Range') ?? '');
+  const ifRange = requestHeaders?.get('If-Range');
+  if (range && (!ifRange || ifRange === etag)) {
+    const start = parseInt(range[1], 10);
+    if (start >= zipBuffer.byteLength) {
+      return new Response(null, { status: 416, headers: { ...headers, 'Content-Range': `bytes */${zipBuffer.byteLength}` } });
     }
-  });
+    headers['Content-Range'] = `bytes ${start}-${zipBuffer.byteLength - 1}/${zipBuffer.byteLength}`;
+    return new Response(zipBuffer.slice(start), { status: 206, headers });
+  }
+
+  return new Response(zipBuffer, { status: 200, headers });
 }
 
 // Function to create a backup of user information
@@ -24,6 +24,9 @@ const getProjectAndStatePath = (c: Context, prefix: string) => {
 terraformGroup.get('/states', async (c) => {
   console.log('Debug: Entering /states route handler');
   const states = await listStates(c);
+  if (states === null) {
+    return c.body(null, 304);
+  }
   console.log('Debug: listStates result:', states);
   return c.json(states);
 });
@@ -31,12 +34,15 @@ terraformGroup.get('/states', async (c) => {
 terraformGroup.get('/states/:projectName/*', async (c) => {
   const { projectName, statePath } = getProjectAndStatePath(c, 'states');
   console.log(`Debug: Getting state for project: ${projectName}, state path: ${statePath}`);
-  return await getState(projectName, statePath, c.env);
+  return await getState(projectName, statePath, c.env, c.req.raw.headers);
 });
 
 terraformGroup.post('/states/:projectName/*', async (c) => {
   const { projectName, statePath } = getProjectAndStatePath(c, 'states');
-  const body = await c.req.text();
+  // Clients may gzip large states on upload
+  const body = c.req.header('Content-Encoding') === 'gzip' && c.req.raw.body
+    ? await new Response(c.req.raw.body.pipeThrough(new DecompressionStream('gzip'))).text()
+    : await c.req.text();
   return await setState(projectName, statePath, body, c.env);
 });
 
@@ -118,7 +124,7 @@ backupGroup.use('*', combinedAuth, async (c, next) => {
   console.log(`Accessing backup route: ${c.req.method} ${c.req.path}`);
   await next();
 });
-backupGroup.get('/backup/states', async (c) => await createStatesBackup(c.env));
+backupGroup.get('/backup/states', async (c) => await createStatesBackup(c.env, c.req.raw.headers));
 backupGroup.get('/backup/users', async (c) => await createUsersBackupZip(c.env));
 
 app.route('/api/v1', backupGroup);
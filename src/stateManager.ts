@@ -1,22 +1,73 @@
 import { Context } from 'hono';
 import { Env } from './types';
 import configManager, { getConfig } from './configManager';
-import { sanitizePath, verifyPassword } from './utils';
+import { sanitizePath, verifyPassword, objectsEtag } from './utils';
+
+// Function to build a Content-Range header value for a ranged R2 read
+function contentRange(range: R2Range, size: number): string {
+  let start: number;
+  let length: number;
+  if ('suffix' in range && range.suffix !== undefined) {
+    start = Math.max(size - range.suffix, 0);
+    length = size - start;
+  } else {
+    start = range.offset ?? 0;
+    length = range.length ?? size - start;
+  }
+  return `bytes ${start}-${start + length - 1}/${size}`;
+}
 
 // Function to retrieve a Terraform state file
-export async function getState(projectName: string, statePath: string, env: Env): Promise<Response> {
+export async function getState(projectName: string, statePath: string, env: Env, requestHeaders?: Headers): Promise<Response> {
   const fullStateName = `${projectName}/${statePath}`;
   const sanitizedStateName = sanitizePath(fullStateName);
   console.log(`Debug: Getting state for ${sanitizedStateName}`);
   try {
-    const object = await env.BUCKET.get(sanitizedStateName);
+    // Settle the range before fetching: R2 rejects a range past the end of the
+    // object, and a stale If-Range must fall back to the full state
+    const range = /^bytes=(\d+)-$/.exec(requestHeaders?.get('Range') ?? '');
+    let ranged = !!requestHeaders?.get('Range');
+    if (ranged) {
+      const head = await env.BUCKET.head(sanitizedStateName);
+      if (!head) {
+        console.log(`Debug: State not found for ${fullStateName}`);
+        return new Response('State not found', { status: 404 });
+      }
+      const ifRange = requestHeaders?.get('If-Range');
+      if (ifRange && ifRange !== head.httpEtag) {
+        ranged = false;
+      } else if (range && parseInt(range[1], 10) >= head.size) {
+        return new Response(null, {
+          status: 416,
+          headers: { 'Content-Range': `bytes */${head.size}`, 'ETag': head.httpEtag },
+        });
+      }
+    }
+
+    const object = await env.BUCKET.get(sanitizedStateName, {
+      onlyIf: requestHeaders,
+      range: ranged ? requestHeaders : undefined,
+    });
+
+    // A failed precondition (e.g. If-None-Match matched) returns metadata only
+    if (object && !('body' in object)) {
+      const status = requestHeaders?.has('If-None-Match') ? 304 : 412;
+      return new Response(null, { status, headers: { 'ETag': object.httpEtag } });
+    }
 
     if (object) {
-      const state = await object.text();
       console.log(`Debug: State found for ${fullStateName}`);
-      return new Response(state, {
-        headers: { 'Content-Type': 'application/json' },
-      });
+      const headers: Record<string, string> = { 'Content-Type': 'application/json', 'Accept-Ranges': 'bytes' };
+      if (object.httpEtag) {
+        headers['ETag'] = object.httpEtag;
+      }
+      // Stream the stored bytes as-is; decoding a range as text would mangle
+      // multi-byte characters split at its edges
+      if (ranged && object.range) {
+        headers['Content-Range'] = contentRange(object.range, object.size);
+        return new Response(object.body, { status: 206, headers });
+      }
+      return new Response(object.body, { headers });
     } else {
       console.log(`Debug: State not found for ${fullStateName}`);
       return new Response('State not found', { status: 404 });
@@ -27,20 +78,56 @@ export async function getState(projectName: string, statePath: string, env: Env)
   }
 }
 
-// Function to list Terraform state files
-export async function listStates(c: Context<{ Bindings: Env }>): Promise<string[]> {
+// Metadata returned for each object when listing with ?details=1
+export interface StateInfo {
+  key: string;
+  size: number;
+  etag: string;
+  uploaded: string;
+}
+
+// Function to list Terraform state files; returns null when the client's
+// If-None-Match still matches the page, so it can answer 304 Not Modified
+export async function listStates(c: Context<{ Bindings: Env }>): Promise<string[] | StateInfo[] | null> {
   console.log(`Debug: Listing states`);
   try {
     if (!c.env.BUCKET) {
       console.error('Debug: BUCKET is undefined');
       throw new Error('Internal server error: BUCKET is undefined');
     }
-    const objects = await c.env.BUCKET.list();
-    console.log(`Debug: Successfully listed objects from R2 bucket:`, objects);
+    // One page per request; clients follow the X-Next-Cursor header for the rest
+    const project = c.req.query('project');
+    const prefix = c.req.query('prefix') ?? (project ? `${sanitizePath(project)}/` : undefined);
+    const limit = parseInt(c.req.query('limit') ?? '', 10);
+    const objects = await c.env.BUCKET.list({
+      prefix,
+      cursor: c.req.query('cursor'),
+      limit: Number.isNaN(limit) ? undefined : Math.min(Math.max(limit, 1), 1000),
+    });
+    console.log(`Debug: Successfully listed ${objects.objects.length} objects from R2 bucket`);
+    if (objects.truncated) {
+      c.header('X-Next-Cursor', objects.cursor);
+    }
+
+    if (c.req.query('details')) {
+      // A page validator lets pollers skip unchanged pages entirely
+      const etag = await objectsEtag(objects.objects, objects.truncated ? '\ntruncated' : '');
+      c.header('ETag', etag);
+      if (c.req.header('If-None-Match') === etag) {
+        return null;
+      }
+      // Let clients detect changed states without downloading them
+      return objects.objects.map((obj: R2Object) => ({
+        key: obj.key,
+        size: obj.size,
+        etag: obj.httpEtag,
+        uploaded: obj.uploaded.toISOString(),
+      }));
+    }
 
     const states = objects.objects.map((obj: { key: string }) => obj.key);
 
-    console.log(`Debug: Found ${states.length} states:`, states);
+    console.log(`Debug: Found ${states.length} states`);
     return states;
   } catch (error) {
     console.error(`Error listing states:`, error);
@@ -8,6 +8,14 @@ export function sanitizePath(path: string): string {
   return filteredParts.join('/').replace(/^\/+|\/+$/g, '');
 }
 
+// Function to compute a validator for a set of listed objects from their keys and etags
+export async function objectsEtag(objects: R2Object[], extra = ''): Promise<string> {
+  const fingerprint = objects.map((object) => `${object.key}:${object.etag}`).sort().join('\n') + extra;
+  const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(fingerprint));
+  const hex = [...new Uint8Array(digest)].map((byte) => byte.toString(16).padStart(2, '0')).join('');
+  return `"${hex}"`;
+}
+
 // Function to hash a password
 export async function hashPassword(password: string): Promise<string> {
   const encoder = new TextEncoder();
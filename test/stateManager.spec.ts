@@ -10,6 +10,7 @@ describe('State Manager', () => {
       BUCKET: {
         put: vi.fn(),
         get: vi.fn(),
+        head: vi.fn(),
         delete: vi.fn(),
         list: vi.fn(),
       } as any,
@@ -20,6 +21,7 @@ describe('State Manager', () => {
     it('should retrieve a state file', async () => {
       const mockState = '{"resources": []}';
       mockEnv.BUCKET.get.mockResolvedValue({
+        body: mockState,
         text: () => Promise.resolve(mockState),
       });
 
@@ -34,6 +36,51 @@ describe('State Manager', () => {
       const response = await getState('test-project', 'non-existent-state', mockEnv);
       expect(response.status).toBe(404);
     });
+
+    it('should return a partial state for a matching If-Range request', async () => {
+      mockEnv.BUCKET.head.mockResolvedValue({ httpEtag: '"etag-1"', size: 10 });
+      mockEnv.BUCKET.get.mockResolvedValue({
+        body: 'resources',
+        httpEtag: '"etag-1"',
+        size: 10,
+        range: { offset: 4, length: 6 },
+      });
+
+      const headers = new Headers({ Range: 'bytes=4-', 'If-Range': '"etag-1"' });
+      const response = await getState('test-project', 'test-state', mockEnv, headers);
+      expect(response.status).toBe(206);
+      expect(response.headers.get('Content-Range')).toBe('bytes 4-9/10');
+      expect(response.headers.get('ETag')).toBe('"etag-1"');
+    });
+
+    it('should return the full state when If-Range no longer matches', async () => {
+      mockEnv.BUCKET.head.mockResolvedValue({ httpEtag: '"etag-2"', size: 4 });
+      mockEnv.BUCKET.get.mockResolvedValue({ body: 'full', httpEtag: '"etag-2"', size: 4 });
+
+      const headers = new Headers({ Range: 'bytes=8-', 'If-Range': '"etag-1"' });
+      const response = await getState('test-project', 'test-state', mockEnv, headers);
+      expect(response.status).toBe(200);
+      expect(await response.text()).toBe('full');
+      expect(mockEnv.BUCKET.get.mock.calls[0][1].range).toBeUndefined();
+    });
+
+    it('should return 416 when the range starts past the end of the state', async () => {
+      mockEnv.BUCKET.head.mockResolvedValue({ httpEtag: '"etag-1"', size: 10 });
+
+      const headers = new Headers({ Range: 'bytes=10-', 'If-Range': '"etag-1"' });
+      const response = await getState('test-project', 'test-state', mockEnv, headers);
+      expect(response.status).toBe(416);
+      expect(response.headers.get('Content-Range')).toBe('bytes */10');
+      expect(mockEnv.BUCKET.get).not.toHaveBeenCalled();
+    });
+
+    it('should return 304 when If-None-Match matches the stored state', async () => {
+      mockEnv.BUCKET.get.mockResolvedValue({ httpEtag: '"etag-1"' });
+
+      const headers = new Headers({ 'If-None-Match': '"etag-1"' });
+      const response = await getState('test-project', 'test-state', mockEnv, headers);
+      expect(response.status).toBe(304);
+    });
   });
 
   // Add tests for setState, deleteState, and listStates
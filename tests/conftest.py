@@ -0,0 +1,17 @@
+import pytest
+from benchmarks.stand_in_api import StandInServer
+from cf_tsm.http_client import configure_client, get_client
+
+@pytest.fixture
+def stand_in():
+    """Offline stand-in API with the shared cf_tsm client pointed at it."""
+    with StandInServer() as server:
+        configure_client(base_url=server.url, auth_header="Bearer test-token")
+        yield server
+
+@pytest.fixture
+def put_state(stand_in):
+    """Store a raw state body on the stand-in, bypassing cf_tsm's own upload checks."""
+    def put(key, body):
+        get_client().post(f"/api/v1/states/{key}", data=body).raise_for_status()
+    return put
@@ -0,0 +1,125 @@
+import socket
+import pytest
+from cf_tsm import StateWatcher, TsmClient
+from cf_tsm.exceptions import ApiError, BatchError, LockedError, LockTimeoutError, NotFoundError, TransportError, TsmError
+from cf_tsm import http_client
+from cf_tsm.http_client import HttpClient, configure_client, get_client
+from cf_tsm.state_management import StateManager
+
+def test_states_round_trip_and_batch_errors(stand_in):
+    tsm = TsmClient()
+    tsm.put_state("project", "a.tfstate", b'{"serial": 1}')
+    tsm.put_state("project", "a.tfstate", b'{"serial": 2}', compress=True)
+    tsm.put_state("project", "b.tfstate", b'{"serial": 1}')
+
+    assert [entry["key"] for entry in tsm.list_states("project", include_backups=False)] == \
+        ["project/a.tfstate", "project/b.tfstate"]
+    assert tsm.get_state("project", "a.tfstate") == b'{"serial": 2}'
+    assert b"".join(tsm.stream_state("project", "a.tfstate", chunk_size=4)) == b'{"serial": 2}'
+
+    with pytest.raises(NotFoundError) as excinfo:
+        tsm.get_state("project", "missing.tfstate")
+    assert excinfo.value.status == 404
+
+    with pytest.raises(BatchError) as excinfo:
+        tsm.get_states(["project/a.tfstate", "project/missing.tfstate"])
+    assert excinfo.value.results == {"project/a.tfstate": b'{"serial": 2}'}
+    assert isinstance(excinfo.value.errors["project/missing.tfstate"], NotFoundError)
+
+def test_put_state_skips_unchanged_and_waits_for_lock(stand_in):
+    tsm = TsmClient()
+    assert tsm.put_state("project", "a.tfstate", b'{"serial": 1}', skip_unchanged=True) == "State updated successfully"
+    assert tsm.put_state("project", "a.tfstate", b'{"serial": 1}', skip_unchanged=True) is None
+    assert [entry["key"] for entry in tsm.list_states("project")] == ["project/a.tfstate"]
+
+    with tsm.locked("project", "a.tfstate", operation="test") as lock_id:
+        assert tsm.get_lock("project", "a.tfstate")["ID"] == lock_id
+        with pytest.raises(LockTimeoutError):
+            tsm.put_state("project", "a.tfstate", b'{"serial": 2}', wait_lock=0.2)
+    tsm.put_state("project", "a.tfstate", b'{"serial": 2}', wait_lock=1)
+    assert tsm.get_lock("project", "a.tfstate") is None
+    assert tsm.get_state("project", "a.tfstate") == b'{"serial": 2}'
+
+def test_context_manager_closes_only_its_own_client(stand_in, monkeypatch):
+    closed = []
+    monkeypatch.setattr(HttpClient, "close", lambda client: closed.append(client))
+    with TsmClient(base_url=stand_in.url, auth_header="Bearer test-token") as tsm:
+        own = tsm.http
+    # Leaving the block must not create the shared client just to compare with it
+    assert closed == [own] and http_client._client is None
+    with TsmClient() as tsm:
+        assert tsm.http is get_client()
+    assert closed == [own]
+
+def test_list_states_reports_unauthorized(stand_in, capsys):
+    stand_in.auth_token = "another-token"
+    StateManager.list_states()
+    assert capsys.readouterr().out == "Error: Unauthorized. Please check your authentication credentials.\n"
+
+def test_unreachable_server_raises_transport_error(tmp_path, capsys):
+    # A port that was just free has nothing listening on it
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+    with TsmClient(base_url=url, auth_header="Bearer test-token", retries=0) as tsm:
+        with pytest.raises(TransportError) as caught:
+            tsm.get_state("project", "a.tfstate")
+    assert isinstance(caught.value, TsmError) and caught.value.__cause__ is not None
+
+    # The CLI commands report it like any other error instead of a traceback
+    configure_client(base_url=url, auth_header="Bearer test-token", retries=0)
+    try:
+        state_file = tmp_path / "terraform.tfstate"
+        state_file.write_bytes(b'{"serial": 1}')
+        assert not StateManager.get_state("project", "a.tfstate")
+        assert not StateManager.set_state("project", "a.tfstate", str(state_file), force=True)
+        assert not StateManager.delete_state("project", "a.tfstate")
+    finally:
+        configure_client()
+    output = capsys.readouterr().out.splitlines()
+    assert [line.split(" failed: ")[0] for line in output] == [
+        "Error: GET /api/v1/states/project/a.tfstate",
+        "Error: POST /api/v1/states/project/a.tfstate",
+        "Error: DELETE /api/v1/states/project/a.tfstate",
+    ]
+
+def test_locks_users_and_config(stand_in):
+    tsm = TsmClient()
+    assert tsm.get_lock("project", "a.tfstate") is None
+    tsm.acquire_lock("project", "a.tfstate", {"ID": "first", "Who": "alice"})
+    with pytest.raises(LockedError) as excinfo:
+        tsm.acquire_lock("project", "a.tfstate", {"ID": "second", "Who": "bob"})
+    assert excinfo.value.lock_info["Who"] == "alice"
+    tsm.release_lock("project", "a.tfstate", "first")
+    assert tsm.get_lock("project", "a.tfstate") is None
+
+    tsm.create_user("carol", "secret", "project", "read")
+    with pytest.raises(ApiError) as excinfo:
+        tsm.create_user("carol", "secret", "project", "read")
+    assert excinfo.value.status == 409
+    tsm.update_user("carol", role="write")
+    assert {"username": "carol", "role": "write"}.items() <= tsm.list_users()[0].items()
+
+    tsm.set_config(3)
+    assert tsm.get_config() == {"maxBackups": 3}
+
+def test_watcher_reports_changes_with_conditional_listing(stand_in):
+    tsm = TsmClient()
+    tsm.put_state("project", "a.tfstate", b'{"serial": 1, "lineage": "x"}')
+    tsm.put_state("project", "b.tfstate", b'{"serial": 1}')
+    watcher = StateWatcher(project="project", page_size=1)
+    assert watcher.poll() == []
+    assert watcher.poll() == []
+    # Both pages of the second poll were answered with 304
+    assert watcher.not_modified == 2
+
+    tsm.put_state("project", "a.tfstate", b'{"serial": 2, "lineage": "x"}')
+    tsm.delete_state("project", "b.tfstate")
+    tsm.put_state("project", "c.tfstate", b'{"serial": 5}')
+    events = watcher.poll()
+    assert [(event["event"], event["key"], event["serial"]) for event in events] == [
+        ("changed", "project/a.tfstate", 2), ("removed", "project/b.tfstate", None), ("added", "project/c.tfstate", 5)]
+    assert events[0]["lineage"] == "x" and events[0]["old_etag"] != events[0]["etag"]
+
+    tsm.put_state("project", "a.tfstate", b'{"serial": 3, "lineage": "x"}')
+    assert [(event["old_serial"], event["serial"]) for event in watcher.poll()] == [(2, 3)]
@@ -0,0 +1,48 @@
+import io
+import json
+from cf_tsm.batch import BatchManager
+
+def test_batch_orders_commands_per_state_and_reports_json(stand_in, tmp_path):
+    first, second = tmp_path / "first.tfstate", tmp_path / "second.tfstate"
+    first.write_bytes(b'{"serial": 1}')
+    second.write_bytes(b'{"serial": 2}')
+    commands = tmp_path / "commands.txt"
+    commands.write_text(f"""# provisioning
+user add --username alice --project infra --role read
+tsm-admin state set infra a.tfstate {first}
+state set infra a.tfstate {second}
+state get infra a.tfstate
+
+user add --username alice --project infra --role read --password secret
+state get infra missing.tfstate
+state frobnicate
+config set --max-backups 3
+""")
+    out = io.StringIO()
+    total, failed = BatchManager.run_batch(str(commands), workers=4, out=out)
+    results = {result["line"]: result for result in map(json.loads, out.getvalue().splitlines())}
+
+    assert (total, failed) == (8, 3)
+    assert sorted(line for line, result in results.items() if result["status"] == "failed") == [7, 8, 9]
+    assert results[2]["password"] and "password" not in results[7]
+    assert results[7]["command"].endswith("--password ***")
+    # Both uploads ran before the get in the same state's chain
+    assert results[5]["output"] == '{"serial": 2}'
+    assert "invalid choice" in results[9]["error"]
+
+def test_batch_fails_bulk_commands_with_failed_items(stand_in, tmp_path):
+    users = tmp_path / "users.csv"
+    users.write_text("username,project,role\nbob,infra,read\n")
+    states = tmp_path / "states"
+    (states / "infra").mkdir(parents=True)
+    (states / "infra" / "a.tfstate").write_bytes(b'{"serial": 1}')
+    commands = tmp_path / "commands.txt"
+    commands.write_text(f"user import {users}\nstate push-all {states}\n")
+    # Every request is refused; both commands still finish with a summary line
+    stand_in.auth_token = "another-token"
+
+    out = io.StringIO()
+    total, failed = BatchManager.run_batch(str(commands), out=out)
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert (total, failed) == (2, 2)
+    assert all(result["status"] == "failed" for result in results)
@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+
+IMPORT_CHECK = """
+import sys
+from cf_tsm.cli import main
+try:
+    main(sys.argv[1:])
+except SystemExit:
+    pass
+print("loaded:" + ",".join(sorted(name for name in ("requests", "urllib3", "cf_tsm.state_management", "cf_tsm.user_management") if name in sys.modules)))
+"""
+
+def loaded_modules(*argv):
+    result = subprocess.run([sys.executable, "-c", IMPORT_CHECK, *argv], capture_output=True, text=True, check=True)
+    return result.stdout.splitlines()[-1].split("loaded:", 1)[1]
+
+def test_help_does_not_load_http_stack():
+    assert loaded_modules("--help") == ""
+
+def test_argument_error_only_loads_requested_manager():
+    assert loaded_modules("--timeout", "5", "state", "get") == "cf_tsm.state_management"
+
+def run_cli(stand_in, *argv, stdin=None):
+    env = dict(os.environ, TSM_BASE_URL=stand_in.url, TSM_AUTH_TOKEN="test-token")
+    return subprocess.run([sys.executable, "-m", "cf_tsm.cli", *argv], input=stdin, capture_output=True, text=True, env=env)
+
+def test_failed_commands_exit_with_status_1(stand_in, put_state):
+    put_state("project/good.tfstate", b'{"version": 4, "serial": 1, "lineage": "L"}')
+    assert run_cli(stand_in, "state", "verify", "--project", "project").returncode == 0
+    assert run_cli(stand_in, "state", "get", "project", "missing.tfstate").returncode == 1
+
+    put_state("project/corrupt.tfstate", b'{"version": 4, "ser')
+    assert run_cli(stand_in, "state", "verify", "--project", "project").returncode == 1
+    batch = run_cli(stand_in, "batch", stdin="state list --project project\nstate verify --project project\n")
+    assert batch.returncode == 1 and "Ran 2 commands, 1 failed." in batch.stderr
@@ -0,0 +1,87 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from cf_tsm.http_client import CircuitBreaker, CircuitOpenError, HttpClient
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Answers 503 until the configured number of failures has been served."""
+
+    def do_GET(self):
+        self.server.calls += 1
+        status = 503 if self.server.calls <= self.server.failures else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    do_POST = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def flaky_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    server.calls, server.failures = 0, 2
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def make_client(server, **kwargs):
+    return HttpClient(base_url=f"http://127.0.0.1:{server.server_address[1]}", auth_header="Bearer test", retry_backoff=0.001, **kwargs)
+
+def test_get_retries_server_errors(flaky_server):
+    assert make_client(flaky_server).get("/api/v1/config").status_code == 200
+    assert flaky_server.calls == 3
+
+def test_post_is_not_retried_unless_asked(flaky_server):
+    client = make_client(flaky_server)
+    assert client.post("/api/v1/lock/p/s", json={}).status_code == 503
+    assert client.post("/api/v1/states/p/s", data=b"{}", retry=True).status_code == 200
+    assert flaky_server.calls == 3
+
+def test_circuit_breaker_opens_after_threshold(flaky_server):
+    flaky_server.failures = 100
+    client = make_client(flaky_server, retries=0, breaker_threshold=2, breaker_reset=60)
+    for _ in range(2):
+        assert client.get("/api/v1/config").status_code == 503
+    with pytest.raises(CircuitOpenError):
+        client.get("/api/v1/config")
+    # Other endpoints are not affected
+    assert client.get("/api/v1/users").status_code == 503
+
+def test_circuit_breaker_counts_requests_not_attempts(flaky_server):
+    flaky_server.failures = 100
+    client = make_client(flaky_server, retries=2, breaker_threshold=2, breaker_reset=60)
+    assert client.get("/api/v1/config").status_code == 503
+    assert flaky_server.calls == 3
+    assert client.get("/api/v1/config").status_code == 503
+    with pytest.raises(CircuitOpenError):
+        client.get("/api/v1/config")
+
+def test_circuit_breaker_frees_trial_after_unexpected_error(flaky_server, monkeypatch):
+    flaky_server.failures = 1
+    client = make_client(flaky_server, retries=0, breaker_threshold=1, breaker_reset=0)
+    assert client.get("/api/v1/config").status_code == 503
+
+    def redirect_loop(*args, **kwargs):
+        raise requests.exceptions.TooManyRedirects("Exceeded 30 redirects.")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(client.session, "request", redirect_loop)
+        with pytest.raises(requests.exceptions.TooManyRedirects):
+            client.get("/api/v1/config")
+    # The failed trial released its slot, so the next one is let through
+    assert client.get("/api/v1/config").status_code == 200
+
+def test_circuit_breaker_half_open_trial():
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+    breaker.record("GET /x", False)
+    breaker.before_request("GET /x")
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request("GET /x")
+    breaker.record("GET /x", True)
+    breaker.before_request("GET /x")
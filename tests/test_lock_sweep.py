@@ -0,0 +1,12 @@
+from cf_tsm.http_client import get_client
+from cf_tsm.lock_management import LockManager
+
+def test_sweep_releases_only_stale_locks(stand_in, put_state):
+    put_state("project/old.tfstate", b"{}")
+    put_state("project/new.tfstate", b"{}")
+    get_client().post("/api/v1/lock/project/old.tfstate", json={"ID": "old", "Created": "2020-01-01T00:00:00Z"})
+    get_client().post("/api/v1/lock/project/new.tfstate", json={"ID": "new"})
+
+    LockManager.sweep(3600, project="project")
+    assert LockManager.get_lock("project/old.tfstate") is None
+    assert LockManager.get_lock("project/new.tfstate")["ID"] == "new"
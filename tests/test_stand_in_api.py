@@ -0,0 +1,23 @@
+from cf_tsm.http_client import get_client
+from cf_tsm.state_management import StateManager
+
+def test_listing_follows_cursor_and_hides_backups(stand_in, put_state):
+    for i in range(5):
+        put_state(f"project/state-{i}.tfstate", b"{}")
+    put_state("project/state-0.tfstate", b'{"serial": 2}')
+
+    pages = list(StateManager.iter_state_pages("project", include_backups=False, page_size=2))
+    keys = [entry["key"] for page in pages for entry in page]
+    assert keys == [f"project/state-{i}.tfstate" for i in range(5)]
+    assert "project/state-0.tfstate.1" in StateManager.fetch_state_keys("project")
+
+def test_upload_that_landed_despite_an_error_is_not_retried(stand_in, put_state, tmp_path, capsys):
+    put_state("project/state.tfstate", b'{"serial": 1}')
+    state_file = tmp_path / "terraform.tfstate"
+    state_file.write_bytes(b'{"serial": 2}')
+    stand_in.write_failures = 1
+    StateManager.set_state("project", "state.tfstate", str(state_file), force=True)
+    assert "State updated successfully" in capsys.readouterr().out
+    # A blind retry would have rotated again and left serial 2 in .1 as well
+    assert StateManager.fetch_state_keys("project") == ["project/state.tfstate", "project/state.tfstate.1"]
+    assert get_client().get("/api/v1/states/project/state.tfstate.1").content == b'{"serial": 1}'
@@ -0,0 +1,57 @@
+import os
+import time
+from cf_tsm.state_cache import StateCache
+
+def test_store_and_lookup(tmp_path):
+    cache = StateCache(root=str(tmp_path))
+    entry = cache.store("project/state", '"etag-1"', [b'{"serial": ', b'1}'])
+
+    cached = cache.lookup("project/state")
+    assert cached["etag"] == '"etag-1"', "ETag should be kept for revalidation"
+    with open(cache.body_path(cached), "rb") as f:
+        assert f.read() == b'{"serial": 1}'
+
+    # A fresh instance reads the persisted index
+    assert StateCache(root=str(tmp_path)).lookup("project/state")["sha256"] == entry["sha256"]
+
+def test_identical_bodies_are_stored_once(tmp_path):
+    cache = StateCache(root=str(tmp_path))
+    cache.store("project/a", '"e"', [b"same"])
+    cache.store("project/b", '"e"', [b"same"])
+    assert cache.stats() == {"entries": 2, "objects": 1, "bytes": 4}
+
+def test_evict_by_size_keeps_most_recently_used(tmp_path):
+    cache = StateCache(root=str(tmp_path), max_bytes=10, grace_period=0)
+    cache.store("project/old", '"1"', [b"x" * 8])
+    time.sleep(0.01)
+    cache.store("project/new", '"2"', [b"y" * 8])
+    cache.evict()
+    assert cache.lookup("project/old") is None
+    assert cache.lookup("project/new") is not None
+    assert len(os.listdir(cache.objects_dir)) == 1
+
+def test_evict_by_age(tmp_path):
+    cache = StateCache(root=str(tmp_path), max_age=0)
+    cache.store("project/state", '"1"', [b"body"])
+    time.sleep(0.01)
+    cache.evict()
+    assert cache.stats()["entries"] == 0
+
+def test_instances_sharing_a_root_keep_each_others_entries(tmp_path):
+    first = StateCache(root=str(tmp_path))
+    second = StateCache(root=str(tmp_path))
+    second.store("project/b", '"b"', [b"second"])
+    entry = first.store("project/a", '"a"', [b"first"])
+    # second still holds the index it loaded before first stored its entry
+    second.evict()
+    assert second.lookup("project/a")["sha256"] == entry["sha256"]
+    assert os.path.exists(first.body_path(entry))
+    assert StateCache(root=str(tmp_path)).stats()["entries"] == 2
+
+def test_evict_keeps_fresh_unreferenced_bodies(tmp_path):
+    cache = StateCache(root=str(tmp_path))
+    # A body written by a store that has not reached the index yet
+    with open(os.path.join(cache.objects_dir, "0" * 64), "wb") as f:
+        f.write(b"pending")
+    cache.evict()
+    assert os.listdir(cache.objects_dir) == ["0" * 64]
@@ -0,0 +1,36 @@
+from cf_tsm.state_diff import diff_states, index_resources
+
+def instance(attributes, index_key=None):
+    entry = {"schema_version": 0, "attributes": attributes}
+    if index_key is not None:
+        entry["index_key"] = index_key
+    return entry
+
+def test_index_resources_addresses():
+    state = {"version": 4, "resources": [
+        {"mode": "managed", "type": "aws_instance", "name": "web", "instances": [instance({}, 0), instance({}, 1)]},
+        {"mode": "data", "type": "aws_ami", "name": "base", "instances": [instance({})]},
+        {"module": "module.net", "mode": "managed", "type": "aws_subnet", "name": "this", "instances": [instance({}, "a")]},
+    ]}
+    assert sorted(index_resources(state)) == [
+        "aws_instance.web[0]", "aws_instance.web[1]", "data.aws_ami.base", 'module.net.aws_subnet.this["a"]',
+    ]
+
+def test_index_resources_version_3():
+    state = {"version": 3, "modules": [
+        {"path": ["root"], "resources": {"aws_instance.web": {"primary": {"attributes": {"id": "i-1"}}}}},
+        {"path": ["root", "net"], "resources": {"aws_vpc.main": {"primary": {"attributes": {"id": "vpc-1"}}}}},
+    ]}
+    assert sorted(index_resources(state)) == ["aws_instance.web", "module.net.aws_vpc.main"]
+
+def test_diff_states():
+    old = {"version": 4, "outputs": {"url": {"value": "a", "type": "string"}, "gone": {"value": 1, "type": "number"}},
+           "resources": [{"mode": "managed", "type": "aws_instance", "name": "web",
+                          "instances": [instance({"id": "i-1", "ami": "x"}, 0), instance({"id": "i-2"}, 1)]}]}
+    new = {"version": 4, "outputs": {"url": {"value": "b", "type": "string"}},
+           "resources": [{"mode": "managed", "type": "aws_instance", "name": "web",
+                          "instances": [instance({"id": "i-1", "ami": "y"}, 0), instance({"id": "i-3"}, 2)]}]}
+    diff = diff_states(old, new)
+    assert diff["resources"] == {"added": ["aws_instance.web[2]"], "removed": ["aws_instance.web[1]"],
+                                 "changed": {"aws_instance.web[0]": ["ami"]}}
+    assert diff["outputs"] == {"added": [], "removed": ["gone"], "changed": {"url": ["value"]}}
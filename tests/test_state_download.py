@@ -0,0 +1,58 @@
+import io
+import json
+import requests
+from cf_tsm.http_client import get_client
+from cf_tsm.state_management import StateManager
+
+def test_download_resumes_partial_file(stand_in, put_state, tmp_path):
+    body = json.dumps({"version": 4, "serial": 1, "resources": ["x" * 100]}).encode()
+    put_state("project/state.tfstate", body)
+    etag = get_client().get("/api/v1/states/project/state.tfstate").headers["ETag"]
+    output = tmp_path / "state.tfstate"
+    (tmp_path / "state.tfstate.part").write_bytes(body[:40])
+    (tmp_path / "state.tfstate.part.etag").write_text(etag)
+
+    received, _ = StateManager.download_to_file("/api/v1/states/project/state.tfstate", str(output))
+    assert received == len(body) - 40
+    assert output.read_bytes() == body
+    assert not (tmp_path / "state.tfstate.part").exists()
+    assert not (tmp_path / "state.tfstate.part.etag").exists()
+
+def test_download_restarts_when_partial_file_is_stale(stand_in, put_state, tmp_path):
+    put_state("project/state.tfstate", b'{"serial": 2}')
+    output = tmp_path / "state.tfstate"
+    # Left over from an interrupted download of an older version
+    (tmp_path / "state.tfstate.part").write_bytes(b'{"serial": 1, "resou')
+    (tmp_path / "state.tfstate.part.etag").write_text('"stale"')
+
+    received, _ = StateManager.download_to_file("/api/v1/states/project/state.tfstate", str(output))
+    assert received == len(b'{"serial": 2}')
+    assert output.read_bytes() == b'{"serial": 2}'
+
+def test_download_restarts_when_resume_is_rejected(stand_in, put_state, tmp_path, monkeypatch):
+    body = b'{"serial": 1}'
+    put_state("project/state.tfstate", body)
+    etag = get_client().get("/api/v1/states/project/state.tfstate").headers["ETag"]
+    output = tmp_path / "state.tfstate"
+    # A longer partial copy under the current ETag, from a corrupted earlier run
+    (tmp_path / "state.tfstate.part").write_bytes(body + b"garbage")
+    (tmp_path / "state.tfstate.part.etag").write_text(etag)
+
+    client = get_client()
+    real_get = client.get
+    ranged = []
+
+    def get(path, **kwargs):
+        if "Range" in kwargs.get("headers", {}):
+            ranged.append(path)
+            rejected = requests.Response()
+            rejected.status_code = 500
+            rejected.raw = io.BytesIO(b"Error getting state")
+            return rejected
+        return real_get(path, **kwargs)
+
+    monkeypatch.setattr(client, "get", get)
+    received, _ = StateManager.download_to_file("/api/v1/states/project/state.tfstate", str(output))
+    assert ranged == ["/api/v1/states/project/state.tfstate"]
+    assert received == len(body)
+    assert output.read_bytes() == body
@@ -0,0 +1,18 @@
+import json
+from cf_tsm.http_client import get_client
+from cf_tsm.state_management import StateManager
+
+def test_history_dedupes_and_rollback_restores(stand_in, put_state, capsys):
+    for serial in (1, 2, 2, 3):
+        put_state("project/a.tfstate", json.dumps({"version": 4, "serial": serial, "lineage": "l1"}).encode())
+    StateManager.state_history("project", "a.tfstate", output_format="json")
+    history = json.loads(capsys.readouterr().out)
+    assert [(entry["slots"], entry["serial"]) for entry in history["versions"]] == [
+        (["current"], 3), (["1", "2"], 2), (["3"], 1),
+    ]
+
+    StateManager.rollback_state("project", "a.tfstate", to=3)
+    assert "Rolled back project/a.tfstate to backup .3 (serial 1), written as serial 4" in capsys.readouterr().out
+    assert get_client().get("/api/v1/states/project/a.tfstate").json() == {"version": 4, "serial": 4, "lineage": "l1"}
+    assert get_client().get("/api/v1/states/project/a.tfstate.1").json()["serial"] == 3
+    assert StateManager.verify_states("project")["failed"] == 0
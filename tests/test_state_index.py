@@ -0,0 +1,22 @@
+import json
+from cf_tsm.state_management import StateManager
+
+def test_index_refreshes_only_changed_states(stand_in, put_state, tmp_path, capsys):
+    web = {"mode": "managed", "type": "aws_instance", "name": "web", "provider": 'provider["registry.terraform.io/hashicorp/aws"]',
+           "instances": [{"index_key": 0, "attributes": {}}, {"index_key": 1, "attributes": {}}]}
+    put_state("project/a.tfstate", json.dumps({"version": 4, "serial": 1, "resources": [web]}).encode())
+    put_state("project/b.tfstate", json.dumps({"version": 4, "serial": 1, "resources": []}).encode())
+    index_path = str(tmp_path / "index.sqlite")
+    StateManager.index_states(index_path=index_path)
+
+    put_state("project/b.tfstate", json.dumps({"version": 4, "serial": 2, "resources": [dict(web, name="api")]}).encode())
+    StateManager.index_states(index_path=index_path)
+    output = capsys.readouterr().out.splitlines()
+    assert output[-1].startswith("Indexed 1 states (2 resources), 1 unchanged, 0 removed, 0 failed.")
+
+    StateManager.query_index(resource_type="aws_instance", provider="hashicorp/aws", index_path=index_path, output_format="ndjson")
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(row["state_path"], row["serial"], row["address"]) for row in rows] == [
+        ("a.tfstate", 1, "aws_instance.web[0]"), ("a.tfstate", 1, "aws_instance.web[1]"),
+        ("b.tfstate", 2, "aws_instance.api[0]"), ("b.tfstate", 2, "aws_instance.api[1]"),
+    ]
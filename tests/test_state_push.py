@@ -0,0 +1,27 @@
+import json
+import os
+import zipfile
+from cf_tsm.http_client import get_client
+from cf_tsm.state_management import StateManager
+
+def test_pull_all_archive_restores_with_push_all(stand_in, put_state, tmp_path):
+    put_state("project/a.tfstate", b'{"serial": 1}')
+    put_state("other/b.tfstate", b'{"serial": 2}')
+    archive = str(tmp_path / "states.zip")
+    StateManager.pull_all(output=archive)
+    with zipfile.ZipFile(archive) as zf:
+        manifest = json.loads(zf.read("manifest.json"))
+    assert [entry["key"] for entry in manifest["states"]] == ["other/b.tfstate", "project/a.tfstate"]
+
+    get_client().delete("/api/v1/states/project/a.tfstate")
+    report = str(tmp_path / "report.json")
+    StateManager.push_all(archive, report=report)
+    with open(report) as f:
+        assert json.load(f) == {"other/b.tfstate": {"status": "unchanged"}, "project/a.tfstate": {"status": "ok"}}
+    assert os.path.exists(archive)
+    assert get_client().get("/api/v1/states/project/a.tfstate").content == b'{"serial": 1}'
+    # Identical states were not uploaded again, so no backups were rotated
+    assert StateManager.fetch_state_keys() == ["other/b.tfstate", "project/a.tfstate"]
+
+    StateManager.push_all(archive, project="other", force=True)
+    assert "other/b.tfstate.1" in StateManager.fetch_state_keys("other")
@@ -0,0 +1,24 @@
+from cf_tsm.state_management import StateManager
+
+def test_sync_fetches_only_changes(stand_in, put_state, tmp_path, capsys):
+    put_state("project/a.tfstate", b"a1")
+    put_state("project/b.tfstate", b"b1")
+    StateManager.sync_states(str(tmp_path), exclude_backups=True)
+
+    put_state("project/a.tfstate", b"a2")
+    StateManager.delete_state("project", "b.tfstate")
+    StateManager.sync_states(str(tmp_path), exclude_backups=True)
+
+    output = capsys.readouterr().out.splitlines()
+    assert output[-1].endswith("0 new, 1 updated, 0 unchanged, 1 deleted, 0 failed")
+    assert (tmp_path / "project" / "a.tfstate").read_bytes() == b"a2"
+    assert not (tmp_path / "project" / "b.tfstate").exists()
+
+def test_sync_restores_deleted_mirror_file(stand_in, put_state, tmp_path, capsys):
+    put_state("project/a.tfstate", b"a1")
+    StateManager.sync_states(str(tmp_path), exclude_backups=True)
+    (tmp_path / "project" / "a.tfstate").unlink()
+
+    assert StateManager.sync_states(str(tmp_path), exclude_backups=True)
+    assert capsys.readouterr().out.splitlines()[-1].endswith("0 new, 1 updated, 0 unchanged, 0 deleted, 0 failed")
+    assert (tmp_path / "project" / "a.tfstate").read_bytes() == b"a1"
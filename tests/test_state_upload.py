@@ -0,0 +1,32 @@
+import threading
+from cf_tsm.api import TsmClient
+from cf_tsm.state_management import StateManager
+
+def test_set_state_skips_unchanged_upload(stand_in, tmp_path, capsys):
+    state_file = tmp_path / "terraform.tfstate"
+    state_file.write_bytes(b'{"serial": 1}')
+    StateManager.set_state("project", "state.tfstate", str(state_file))
+    StateManager.set_state("project", "state.tfstate", str(state_file))
+    output = capsys.readouterr().out
+    assert "State updated successfully" in output
+    assert "State unchanged, skipping upload" in output
+    # Only the first upload rotated a backup
+    assert StateManager.fetch_state_keys("project") == ["project/state.tfstate"]
+
+def test_set_state_waits_for_held_lock(stand_in, tmp_path, capsys):
+    tsm = TsmClient()
+    state_file = tmp_path / "terraform.tfstate"
+    state_file.write_bytes(b'{"serial": 1}')
+    tsm.acquire_lock("project", "state.tfstate", {"ID": "apply", "Who": "ci"})
+    StateManager.set_state("project", "state.tfstate", str(state_file), wait_lock=0.3)
+    assert "Timed out after 0s waiting for the lock on project/state.tfstate, held by ci" in capsys.readouterr().out
+    assert StateManager.fetch_state_keys("project") == []
+
+    releaser = threading.Timer(0.5, tsm.release_lock, ("project", "state.tfstate", "apply"))
+    releaser.start()
+    StateManager.set_state("project", "state.tfstate", str(state_file), wait_lock=30)
+    releaser.join()
+    assert "State updated successfully" in capsys.readouterr().out
+    assert tsm.get_state("project", "state.tfstate") == b'{"serial": 1}'
+    # The lock taken for the upload was released afterwards
+    assert tsm.get_lock("project", "state.tfstate") is None
@@ -0,0 +1,47 @@
+import hashlib
+import json
+from cf_tsm.state_management import StateManager
+from cf_tsm.state_verify import check_chain, check_document, check_object
+
+def record(slot_body, etag=None, size=None):
+    body = json.dumps(slot_body).encode() if not isinstance(slot_body, bytes) else slot_body
+    md5 = hashlib.md5(body).hexdigest()
+    entry = {"key": "p/s.tfstate", "etag": etag or f'"{md5}"', "size": len(body) if size is None else size}
+    return check_object(body, len(body), hashlib.sha256(body).hexdigest(), md5, entry)
+
+def test_check_object_reports_corruption():
+    assert record({"version": 4, "serial": 1, "lineage": "L", "resources": []})["issues"] == []
+    assert record(b'{"version": 4,')["issues"][0].startswith("invalid JSON")
+    assert check_document({"version": 9, "serial": -1}) == ["unsupported state version 9", "invalid serial -1", "missing lineage"]
+    mismatched = record({"version": 4, "serial": 1, "lineage": "L"}, etag='"' + "0" * 32 + '"', size=1)
+    assert [issue.split()[0] for issue in mismatched["issues"]] == ["listed", "ETag"]
+    # Multipart ETags are not an MD5 of the body and are not compared
+    assert record({"version": 4, "serial": 1, "lineage": "L"}, etag='"abc-2"')["issues"] == []
+
+def test_check_chain_follows_rotation_order():
+    state = {"version": 4, "lineage": "L"}
+    assert check_chain({0: record(dict(state, serial=3)), 1: record(dict(state, serial=2)), 2: record(dict(state, serial=2))}) == []
+    assert check_chain({0: record(dict(state, serial=1)), 1: record(dict(state, serial=2))}) == \
+        ["serial goes backwards: .1 has 2, newer current has 1"]
+    assert check_chain({0: record(dict(state, serial=2, outputs={"a": 1})), 1: record(dict(state, serial=2))}) == \
+        ["serial 2 names different contents in .1 and current"]
+    assert check_chain({1: record(dict(state, serial=2)), 3: record(dict(state, lineage="M", serial=1))}) == [
+        "backups exist but the current state is missing", "missing backup slots .2",
+        "lineage changes from M in .3 to L in .1"]
+
+def test_verify_reports_corrupt_and_inconsistent_backups(stand_in, put_state, capsys):
+    put_state("project/good.tfstate", b'{"version": 4, "serial": 1, "lineage": "L"}')
+    put_state("project/good.tfstate", b'{"version": 4, "serial": 2, "lineage": "L"}')
+    put_state("project/corrupt.tfstate", b'{"version": 4, "ser')
+    put_state("project/corrupt.tfstate", b'{"version": 4, "serial": 3, "lineage": "L"}')
+    put_state("project/rewound.tfstate", b'{"version": 4, "serial": 5, "lineage": "L"}')
+    put_state("project/rewound.tfstate", b'{"version": 4, "serial": 2, "lineage": "L"}')
+
+    report = StateManager.verify_states("project", workers=4)
+    output = capsys.readouterr().out
+    assert (report["checked"], report["states"], report["failed"]) == (6, 3, 2)
+    assert [state["key"] for state in report["results"] if not state["ok"]] == \
+        ["project/corrupt.tfstate", "project/rewound.tfstate"]
+    assert ".1: invalid JSON" in output
+    assert "serial goes backwards: .1 has 5, newer current has 2" in output
+    assert output.splitlines()[-1].endswith("1 ok, 2 with problems.")
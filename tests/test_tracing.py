@@ -0,0 +1,30 @@
+import json
+from cf_tsm.http_client import configure_client
+from cf_tsm.state_management import StateManager
+from cf_tsm.tracing import RequestTracer, route_template
+
+def test_route_template():
+    assert route_template("/api/v1/states/proj/env/prod.tfstate") == "/api/v1/states/:projectName/*"
+    assert route_template("/api/v1/lock/proj/prod.tfstate") == "/api/v1/lock/:projectName/*"
+    assert route_template("/api/v1/users/alice") == "/api/v1/users/:username"
+    assert route_template("/api/v1/states?project=proj&details=1") == "/api/v1/states"
+
+def test_tracer_records_each_call(stand_in, tmp_path):
+    trace_file = tmp_path / "trace.jsonl"
+    tracer = RequestTracer(str(trace_file))
+    configure_client(base_url=stand_in.url, auth_header="Bearer test-token", tracer=tracer)
+    source = tmp_path / "state.json"
+    source.write_bytes(b'{"serial": 1}')
+
+    StateManager.set_state("proj", "a.tfstate", str(source), force=True)
+    StateManager.download_to_file("/api/v1/states/proj/a.tfstate", str(tmp_path / "out.json"))
+    tracer.close()
+
+    records = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    assert [(r["method"], r["status"]) for r in records] == [("POST", 200), ("GET", 200)]
+    assert records[0]["bytes_sent"] == 13
+    assert records[1]["bytes_received"] == 13
+    assert all(r["route"] == "/api/v1/states/:projectName/*" for r in records)
+    assert all(r["total_ms"] >= r["ttfb_ms"] for r in records)
+    rows = tracer.summary_rows()
+    assert [(row["method"], row["count"]) for row in rows] == [("GET", 1), ("POST", 1)]
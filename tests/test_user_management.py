@@ -0,0 +1,66 @@
+import csv
+import json
+import os
+import stat
+from cf_tsm.api import TsmClient
+from cf_tsm.user_management import UserManager
+
+def test_import_csv_generates_passwords_and_reports_failures(stand_in, tmp_path, capsys):
+    TsmClient().create_user("existing", "secret", "infra", "read")
+    users = tmp_path / "users.csv"
+    users.write_text("username,project,role,password\n"
+                     "alice,infra,read,alice-secret\n"
+                     "bob,infra,write,\n"
+                     "existing,infra,read,\n"
+                     "carol,infra,,\n")
+    UserManager.import_users(str(users), workers=2)
+    assert "Imported 2 of 4 users, 2 failed." in capsys.readouterr().out
+
+    results_path = tmp_path / "users.csv.results.csv"
+    assert stat.S_IMODE(os.stat(results_path).st_mode) == 0o600
+    with open(results_path, newline="") as f:
+        results = {row["username"]: row for row in csv.DictReader(f)}
+    assert {name: row["status"] for name, row in results.items()} == \
+        {"alice": "created", "bob": "created", "existing": "failed", "carol": "failed"}
+    # Only passwords the import generated are written back
+    assert results["alice"]["password"] == "" and len(results["bob"]["password"]) >= 16
+    assert results["existing"]["detail"].startswith("409")
+    assert results["carol"]["detail"].startswith("400")
+    assert {user["username"] for user in TsmClient().list_users()} == {"existing", "alice", "bob"}
+
+def test_import_json_writes_json_results(stand_in, tmp_path):
+    users = tmp_path / "users.json"
+    users.write_text(json.dumps([{"username": "dave", "project": "infra", "role": "read"}]))
+    results_path = tmp_path / "results.json"
+    UserManager.import_users(str(users), results_path=str(results_path))
+    assert stat.S_IMODE(os.stat(results_path).st_mode) == 0o600
+    [result] = json.loads(results_path.read_text())
+    assert result["status"] == "created" and result["password"]
+
+def test_import_reports_unreadable_files(stand_in, tmp_path, capsys):
+    malformed = tmp_path / "malformed.json"
+    malformed.write_text('[{"username": "dave"')
+    not_a_list = tmp_path / "object.json"
+    not_a_list.write_text(json.dumps({"username": "dave"}))
+
+    assert not UserManager.import_users(str(tmp_path / "missing.csv"))
+    assert not UserManager.import_users(str(malformed))
+    assert not UserManager.import_users(str(not_a_list))
+    output = capsys.readouterr().out.splitlines()
+    assert len(output) == 3 and all(line.startswith("Import users failed: ") for line in output)
+    assert TsmClient().list_users() == []
+
+def test_export_writes_users_in_either_format(stand_in, tmp_path, capsys):
+    tsm = TsmClient()
+    tsm.create_user("alice", "secret", "infra", "read")
+    tsm.create_user("bob", "secret", "apps", "write")
+
+    UserManager.export_users(str(tmp_path / "users.json"))
+    UserManager.export_users(str(tmp_path / "users.csv"), from_backup=True)
+    assert capsys.readouterr().out.count("Exported 2 users") == 2
+
+    exported = json.loads((tmp_path / "users.json").read_text())
+    assert [(user["username"], user["project"], user["role"], user["password"]) for user in exported] == \
+        [("alice", "infra", "read", ""), ("bob", "apps", "write", "")]
+    with open(tmp_path / "users.csv", newline="") as f:
+        assert [row["username"] for row in csv.DictReader(f)] == ["alice", "bob"]
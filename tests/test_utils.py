@@ -0,0 +1,54 @@
+import io
+from datetime import datetime, timezone
+import pytest
+from cf_tsm.utils import parse_duration, parse_timestamp, copy_stream, run_concurrently
+
+def test_parse_duration_units():
+    assert parse_duration("90") == 90
+    assert parse_duration("30m") == 1800
+    assert parse_duration("2h") == 7200
+    assert parse_duration("1d") == 86400
+    with pytest.raises(ValueError):
+        parse_duration("soon")
+
+def test_parse_timestamp_accepts_terraform_nanoseconds():
+    created = parse_timestamp("2024-05-01T10:11:12.123456789Z")
+    assert created == datetime(2024, 5, 1, 10, 11, 12, 123456, tzinfo=timezone.utc)
+
+def test_parse_timestamp_keeps_offset():
+    created = parse_timestamp("2023-01-01T02:00:00+02:00")
+    assert created == datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+def test_parse_timestamp_without_fraction_or_offset():
+    assert parse_timestamp("2023-01-01 00:00:00") == datetime(2023, 1, 1, tzinfo=timezone.utc)
+    with pytest.raises(ValueError):
+        parse_timestamp("yesterday")
+
+def test_copy_stream_reports_size_and_hash():
+    out = io.BytesIO()
+    size, sha256 = copy_stream([b"abc", b"", b"def"], out)
+    assert out.getvalue() == b"abcdef"
+    assert size == 6
+    assert sha256 == "bef57ec7f53a6d40beb640a780a639c83bc29ac8a9816f1fc6c5c6dcd93c4721"
+
+def test_run_concurrently_bounds_items_in_flight():
+    pulled = []
+
+    def items():
+        for item in range(100):
+            pulled.append(item)
+            yield item
+
+    def square(item):
+        if item == 3:
+            raise ValueError("bad item")
+        return item * item
+
+    outcomes = []
+    for item, result, error in run_concurrently(square, items(), workers=2):
+        outcomes.append((item, result, error))
+        # Only a window of two items per worker is ever queued ahead
+        assert len(pulled) - len(outcomes) <= 4
+    assert sorted(item for item, _, _ in outcomes) == list(range(100))
+    assert [str(error) for _, _, error in outcomes if error] == ["bad item"]
+    assert all(result == item * item for item, result, error in outcomes if not error)